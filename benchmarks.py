@@ -0,0 +1,354 @@
+# See file COPYING distributed with python-unf for copyright and license.
+
+"""Benchmarks for unf.
+
+Each case (an input type) is run for each size and digits setting in 
+a fresh process, so that its peak resident set size (RSS) is its own, 
+and reported as elements per second, megabytes per second of 
+normalized output, and peak RSS.  Cases needing NumPy, pandas, or 
+pyarrow are skipped if these are not installed.
+
+    python3 benchmarks.py                     all cases, sizes to 10**6
+    python3 benchmarks.py --max-size 1e8 numpy
+    python3 benchmarks.py --set FREXP_EXPONENTS=True --compare old.json
+
+--set changes a module constant of unf in each case's process, so 
+engines can be compared with the default ones; --json saves the 
+results and --compare shows the ratio of each throughput to that in 
+saved results.
+"""
+
+import argparse
+import ast
+import json
+import multiprocessing
+import sys
+import timeit
+
+import unf
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+DEFAULT_SIZES = [1, 10**2, 10**4, 10**6]
+DEFAULT_DIGITS = [unf.DEFAULT_DIGITS, 15]
+
+# Each case is timed until it has run for at least this many seconds, 
+# and the fastest run is reported.
+MIN_TIME = 0.2
+
+# 2-D arrays and data frames have this many vectors (or fewer, for 
+# small sizes)
+N_VECTORS = 10
+
+# the rows of the many-rows case (a tall array, as of observations by 
+# variables) have this many values
+SHORT_ROW_LENGTH = 8
+
+# --- data ---------------------------------------------------------------
+
+def _floats(size):
+    """Return size floats with many significant digits."""
+    return numpy.random.default_rng(0).standard_normal(size) * 1e3
+
+def _ints(size):
+    """Return size integers of up to 12 digits."""
+    return numpy.random.default_rng(0).integers(-10**12, 10**12, size)
+
+def _strings(size):
+    """Return size strings of 1 to 20 characters."""
+    rng = numpy.random.default_rng(0)
+    letters = numpy.array(list('abcdefghijklmnopqrstuvwxyz é'))
+    lengths = rng.integers(1, 21, size)
+    chars = letters[rng.integers(0, len(letters), int(lengths.sum()))]
+    ends = lengths.cumsum()
+    return [ ''.join(chars[end-n:end])
+             for (n, end) in zip(lengths.tolist(), ends.tolist()) ]
+
+def _specials(size):
+    """Return size floats, a quarter each nan, inf, zero, and other."""
+    values = _floats(size)
+    kind = numpy.arange(size) % 4
+    values[kind == 0] = numpy.nan
+    values[kind == 1] = numpy.inf
+    values[kind == 2] = 0.0
+    return values
+
+def _special_list(size):
+    """Return _specials() with None for the zeros."""
+    return [ None if v == 0 else v for v in _specials(size).tolist() ]
+
+def _frame(size):
+    """Return a data frame of float, int, string, and Int64 columns.
+
+    The frame has N_VECTORS columns (or fewer, for small sizes) and 
+    size values in all.
+    """
+    n_columns = max(1, min(N_VECTORS, size))
+    columns = {}
+    for i in range(n_columns):
+        n = size // n_columns + (i < size % n_columns)
+        kind = i % 4
+        if kind == 0:
+            columns[f'c{i}'] = _floats(n)
+        elif kind == 1:
+            columns[f'c{i}'] = _ints(n)
+        elif kind == 2:
+            columns[f'c{i}'] = pandas.array(_strings(n), dtype='string')
+        else:
+            values = pandas.array(_ints(n), dtype='Int64')
+            values[::5] = None
+            columns[f'c{i}'] = values
+    return pandas.DataFrame(columns)
+
+def _matrix(size):
+    """Return a 2-D float array of N_VECTORS rows."""
+    n = max(1, min(N_VECTORS, size))
+    return _floats(size - size % n).reshape(n, -1)
+
+def _short_rows(size):
+    """Return a 2-D float array of many rows of SHORT_ROW_LENGTH values."""
+    n = max(1, size // SHORT_ROW_LENGTH)
+    return _floats(n * SHORT_ROW_LENGTH).reshape(n, -1)
+
+# name: (the package needed, if any, a function returning the object 
+# of size elements, and whether the case has a single element)
+CASES = {
+    'scalar-float': (None, lambda size: 1.23456789, True), 
+    'scalar-int': (None, lambda size: 123456789, True), 
+    'scalar-string': (None, lambda size: 'a string', True), 
+    'list-float': ('numpy', lambda size: _floats(size).tolist(), False), 
+    'list-int': ('numpy', lambda size: _ints(size).tolist(), False), 
+    'list-string': ('numpy', _strings, False), 
+    'list-special': ('numpy', _special_list, False), 
+    'numpy-float': ('numpy', _floats, False), 
+    'numpy-int': ('numpy', _ints, False), 
+    'numpy-string': ('numpy', 
+                     lambda size: numpy.array(_strings(size)), 
+                     False), 
+    'numpy-special': ('numpy', _specials, False), 
+    'numpy-2d-float': ('numpy', _matrix, False), 
+    'numpy-2d-int': ('numpy', 
+                     lambda size: _matrix(size).astype('int64'), 
+                     False), 
+    'numpy-2d-short-rows': ('numpy', _short_rows, False), 
+    'pandas-float': ('pandas', 
+                     lambda size: pandas.Series(_floats(size)), 
+                     False), 
+    'pandas-int': ('pandas', lambda size: pandas.Series(_ints(size)), False), 
+    'pandas-string': ('pandas', 
+                      lambda size: pandas.Series(_strings(size), 
+                                                 dtype='string'), 
+                      False), 
+    'pandas-special': ('pandas', 
+                       lambda size: pandas.Series(_specials(size)), 
+                       False), 
+    'pandas-dataframe': ('pandas', _frame, False), 
+    'arrow-float': ('pyarrow', 
+                    lambda size: pyarrow.array(_floats(size)), 
+                    False), 
+    'arrow-string': ('pyarrow', 
+                     lambda size: pyarrow.array(_strings(size)), 
+                     False), 
+}
+
+# --- running ------------------------------------------------------------
+
+def run_case(name, size, digits, settings=None):
+    """Run a case in this process.
+
+    settings maps names of unf module constants to values to use. 
+    Returns a dictionary of results.
+    """
+    for (attr, value) in (settings or {}).items():
+        if not hasattr(unf, attr):
+            raise ValueError(f'unf has no attribute {attr}')
+        setattr(unf, attr, value)
+    (package, make, single) = CASES[name]
+    if single:
+        size = 1
+    data = make(size)
+    rss_data = _peak_rss()
+    n_bytes = _normalized_bytes(data, digits)
+    timer = timeit.Timer(lambda: unf.unf(data, digits))
+    # enough calls per run to take a tenth of MIN_TIME
+    (number, elapsed) = (1, timer.timeit(1))
+    while elapsed < MIN_TIME / 10:
+        number *= 10
+        elapsed = timer.timeit(number)
+    runs = [elapsed / number]
+    while sum(runs) * number < MIN_TIME:
+        runs.append(timer.timeit(number) / number)
+    seconds = min(runs)
+    peak_rss = _peak_rss()
+    return {
+        'case': name, 
+        'size': size, 
+        'digits': digits, 
+        'seconds': seconds, 
+        'elements_per_second': size / seconds, 
+        'mb_per_second': n_bytes / seconds / 1e6, 
+        'peak_rss_mb': peak_rss, 
+        'extra_rss_mb': None if peak_rss is None else peak_rss - rss_data, 
+    }
+
+def _normalized_bytes(data, digits):
+    """Return the length of the normalized values of data.
+
+    For a higher-level object, this is the total over its vectors 
+    (rather than the length of their normalized digests).
+    """
+    vectors = unf._vectors(data)
+    if vectors is None:
+        vectors = [(None, data)]
+    return sum(len(piece) 
+               for (name, vector) in vectors 
+               for piece in unf._iter_normalize(vector, digits))
+
+def _peak_rss():
+    """Return the peak RSS of this process in megabytes, or None."""
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    if sys.platform == 'darwin':
+        return maxrss / 2**20
+    return maxrss / 2**10
+
+def _run_in_process(args):
+    """Run a case (run_case() arguments) in the pool's process."""
+    return run_case(*args)
+
+def run(names, sizes, digits_list, settings=None):
+    """Run cases for each size and digits setting, generating results.
+
+    Each run is in its own process.  Cases with a single element run 
+    once for each digits setting.
+    """
+    context = multiprocessing.get_context('spawn')
+    for name in names:
+        single = CASES[name][2]
+        for digits in digits_list:
+            for size in ([1] if single else sizes):
+                with context.Pool(1, maxtasksperchild=1) as pool:
+                    args = (name, size, digits, settings)
+                    yield pool.apply(_run_in_process, (args,))
+    return
+
+# --- command line -------------------------------------------------------
+
+_HEADER = f'{"case":18} {"size":>10} {"dig":>4} {"elements/s":>12} ' \
+          f'{"MB/s":>10} {"peak RSS":>10}'
+
+def _format(result, previous=None):
+    """Format a result (and its ratio to a previous one) as a line."""
+    line = f'{result["case"]:18} {result["size"]:10d} ' \
+           f'{result["digits"]:4d} {result["elements_per_second"]:12.4g} ' \
+           f'{result["mb_per_second"]:10.2f}'
+    if result['peak_rss_mb'] is None:
+        line += f' {"-":>10}'
+    else:
+        line += f' {result["peak_rss_mb"]:10.1f}'
+    if previous is not None:
+        ratio = result['elements_per_second'] / \
+                previous['elements_per_second']
+        line += f' {ratio:8.2f}x'
+    return line
+
+def _key(result):
+    """Return the case, size, and digits of a result."""
+    return (result['case'], result['size'], result['digits'])
+
+def main(args=None):
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(
+        prog='python3 benchmarks.py', 
+        description='Benchmark unf.'
+    )
+    parser.add_argument('--max-size', 
+                        type=lambda s: int(float(s)), 
+                        default=max(DEFAULT_SIZES), 
+                        help='largest number of elements (default '
+                             '%(default)s; sizes are powers of 100 and '
+                             'this)')
+    parser.add_argument('--digits', '-d', 
+                        default=','.join(map(str, DEFAULT_DIGITS)), 
+                        help='comma-separated digits settings (default '
+                             '%(default)s)')
+    parser.add_argument('--set', 
+                        action='append', 
+                        default=[], 
+                        metavar='NAME=VALUE', 
+                        help='set a unf module constant (a Python '
+                             'literal) for the runs')
+    parser.add_argument('--json', metavar='FILE', help='save the results')
+    parser.add_argument('--compare', 
+                        metavar='FILE', 
+                        help='compare with results saved with --json')
+    parser.add_argument('--list', 
+                        action='store_true', 
+                        help='list the cases and exit')
+    parser.add_argument('patterns', 
+                        nargs='*', 
+                        metavar='PATTERN', 
+                        help='run only cases with names containing one '
+                             'of these')
+    args = parser.parse_args(args)
+    names = [ name for name in CASES 
+              if not args.patterns 
+              or any(p in name for p in args.patterns) ]
+    if args.list:
+        for name in names:
+            print(name)
+        return 0
+    available = []
+    for name in names:
+        package = CASES[name][0]
+        if package is None or globals()[package] is not None:
+            available.append(name)
+        else:
+            print(f'skipping {name} ({package} not installed)', 
+                  file=sys.stderr)
+    sizes = [ s for s in [1, 10**2, 10**4, 10**6, 10**8]
+              if s < args.max_size ]
+    sizes.append(args.max_size)
+    digits_list = [ int(d) for d in args.digits.split(',') ]
+    settings = {}
+    for setting in args.set:
+        (name, _, value) = setting.partition('=')
+        settings[name] = ast.literal_eval(value)
+    previous = {}
+    if args.compare:
+        with open(args.compare) as fo:
+            previous = { _key(r): r for r in json.load(fo) }
+    print(_HEADER)
+    results = []
+    for result in run(available, sizes, digits_list, settings):
+        print(_format(result, previous.get(_key(result))), flush=True)
+        results.append(result)
+    if args.json:
+        with open(args.json, 'w') as fo:
+            json.dump(results, fo, indent=1)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+# eof
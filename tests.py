@@ -11,9 +11,24 @@
 # and http://guides.dataverse.org/en/latest/developers/unf/unf-v6.html.
 
 import unittest.mock
+import concurrent.futures
+import asyncio
+import contextlib
+import tempfile
+import hashlib
+import json
+import os.path
 import math
+import io
+import base64
+import logging
+import tracemalloc
+import subprocess
+import threading
+import sys
 
 import unf
+import benchmarks
 
 try:
     import numpy
@@ -25,6 +40,15 @@ try:
 except ImportError:
     pandas = None
 
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Some tests call private functions directly, before unf has seen (and 
+# bound) the optional packages.
+unf._import_loaded()
+
 class IQSSTests(unittest.TestCase):
 
     # Tests from 
@@ -350,6 +374,55 @@ class TestUNFs(unittest.TestCase):
         self.assertEqual(u, 'UNF:6:vbTNUOoynDv6UKxOn36WeQ==')
         return
 
+    # Rounding 9.99999999 to 7 digits carries into an extra digit.
+    def test_carry(self):
+        self.assertEqual(unf._normalize(9.99999999, 7), b'+1.e+1\n\0')
+        self.assertEqual(unf._normalize(-0.99999999, 7), b'-1.e+\n\0')
+        self.assertEqual(unf._normalize(99999999.9, 7), b'+1.e+8\n\0')
+        return
+
+    # The carry changed the UNFs of numbers and lists (see CHANGES): 
+    # 9.99999999 was +1.e+ and 0.9999999996 was +1.e-1.
+    def test_carry_unfs(self):
+        u = 'UNF:6:o+nTsng0TLIV1N3Dqa2rRA=='
+        self.assertEqual(unf.unf([9.99999999]), u)
+        self.assertEqual(unf.unf(9.99999999), u)
+        self.assertEqual(unf.unf(10), u)
+        u = 'UNF:6:tv3XYCv524AfmlFyVOhuZg=='
+        self.assertEqual(unf.unf([0.9999999996]), u)
+        self.assertEqual(unf.unf(1), u)
+        return
+
+    def test_smallest(self):
+        s = b'+4.940656e-324\n\0'
+        self.assertEqual(unf._normalize(5e-324, unf.DEFAULT_DIGITS), s)
+        s = b'+1.e-310\n\0'
+        self.assertEqual(unf._normalize(1e-310, unf.DEFAULT_DIGITS), s)
+        return
+
+    def test_cache(self):
+        # 0.0 and -0.0 (and 1 and 1.0) are equal keys
+        vals = [0.0, -0.0, 0, 1, 1.0, True, 1e-5, 2**60 + 1]
+        expected = [ unf._normalize_number(v, 7) for v in vals[:5] ] \
+                   + [b'+1.e+\n\0'] \
+                   + [ unf._normalize_number(v, 7) for v in vals[6:] ]
+        self.assertEqual(expected[1], b'-0.e+\n\0')
+        for i in range(2):
+            normalized = [ unf._normalize(v, 7) for v in vals ]
+            self.assertEqual(normalized, expected)
+        self.assertEqual(unf._normalize(1e-5, 2), b'+1.e-5\n\0')
+        return
+
+    def test_cache_nan(self):
+        # nan goes around the cache (each nan would be a miss)
+        unf._normalize_number_cached.cache_clear()
+        unf._normalize([1.5, 2.5], 7)
+        for i in range(10):
+            self.assertEqual(unf._normalize(float('nan'), 7), b'+nan\n\0')
+        info = unf._normalize_number_cached.cache_info()
+        self.assertEqual((info.misses, info.currsize), (2, 2))
+        return
+
     def test_compound_value(self):
         with self.assertRaises(TypeError):
             unf.unf([1, [1.23456789, None, 0]])
@@ -444,6 +517,87 @@ class TestDigits(unittest.TestCase):
         self.assertEqual(u, 'UNF:6:N9:TCfkDjJvqAJ7wy4sdQFRaw==')
         return
 
+class TestHasher(unittest.TestCase):
+
+    def test_single_update(self):
+        val = [1.23456789, None, 0]
+        h = unf.UNFHasher()
+        h.update(val)
+        self.assertEqual(h.unf(), unf.unf(val))
+        return
+
+    def test_chunks(self):
+        h = unf.UNFHasher()
+        h.update(1.23456789)
+        h.update([None])
+        h.update((0, ))
+        self.assertEqual(h.unf(), 'UNF:6:Do5dfAoOOFt4FSj0JcByEw==')
+        return
+
+    def test_empty(self):
+        h = unf.UNFHasher()
+        self.assertEqual(h.unf(), unf.unf([]))
+        return
+
+    def test_digits(self):
+        h = unf.UNFHasher(9)
+        h.update(1.23456789)
+        self.assertEqual(h.unf(), 'UNF:6:N9:IKw+l4ywdwsJeDze8dplJA==')
+        return
+
+    def test_digits_error(self):
+        with self.assertRaises(TypeError):
+            unf.UNFHasher('')
+        with self.assertRaises(ValueError):
+            unf.UNFHasher(0)
+        return
+
+    def test_digest(self):
+        h = unf.UNFHasher()
+        h.update(1.23456789)
+        self.assertEqual(len(h.digest()), unf.HASH_BYTES)
+        self.assertEqual(h.hexdigest(), h.digest().hex())
+        return
+
+    def test_copy(self):
+        h1 = unf.UNFHasher()
+        h1.update([1.23456789, None])
+        h2 = h1.copy()
+        h2.update(0)
+        self.assertEqual(h1.unf(), unf.unf([1.23456789, None]))
+        self.assertEqual(h2.unf(), 'UNF:6:Do5dfAoOOFt4FSj0JcByEw==')
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_numpy_chunks(self):
+        h = unf.UNFHasher()
+        h.update(numpy.array([1, 2]))
+        h.update(numpy.array([3.0]))
+        self.assertEqual(h.unf(), 'UNF:6:AvELPR5QTaBbnq6S22Msow==')
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_numpy_2d_chunk(self):
+        h = unf.UNFHasher()
+        with self.assertRaises(ValueError):
+            h.update(numpy.array([[1, 2], [3, 4]]))
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_pandas_chunks(self):
+        h = unf.UNFHasher()
+        h.update(pandas.Series([1, 2]))
+        h.update(pandas.Series([3]))
+        self.assertEqual(h.unf(), 'UNF:6:AvELPR5QTaBbnq6S22Msow==')
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_data_frame_chunk(self):
+        h = unf.UNFHasher()
+        with self.assertRaises(TypeError):
+            h.update(pandas.DataFrame({'a': [1, 2], 'b': [3, 4]}))
+        return
+
 @unittest.skipIf(not numpy, 'numpy not installed')
 class TestNumpy(unittest.TestCase):
 
@@ -520,6 +674,226 @@ class TestNumpy(unittest.TestCase):
             unf.unf(a)
         return
 
+    def test_dim_2_long_rows(self):
+        # rows are digested as vectors, so rows whose normalized form is 
+        # longer than STRING_CHARACTERS must not be truncated
+        a = numpy.arange(60, dtype=float).reshape((2, 30)) / 7
+        digests = sorted(unf._digest(list(row), 7) for row in a)
+        u = 'UNF:6:' + unf._digest(digests, 7)
+        self.assertEqual(unf.unf(a), u)
+        return
+
+    def test_dim_2_short_rows(self):
+        # short rows are formatted in batches, which must not change 
+        # their UNFs
+        a = numpy.arange(600).reshape((200, 3)) / 7
+        a[5, 1] = numpy.nan
+        a[7] = [numpy.inf, -0.0, 0.0]
+        for block_size in (16, unf.NUMPY_BLOCK_SIZE):
+            with unittest.mock.patch('unf.NUMPY_BLOCK_SIZE', block_size):
+                (u, rows) = unf.unf_detail(a)
+            digests = sorted(unf._digest(row, 7) for row in a)
+            self.assertEqual(u, 'UNF:6:' + unf._digest(digests, 7))
+            self.assertEqual(rows, { i: unf.unf(row) 
+                                     for (i, row) in enumerate(a) })
+        a = numpy.arange(60).reshape((3, 20))
+        with unittest.mock.patch('unf.NUMPY_BLOCK_SIZE', 16):
+            self.assertEqual(unf.unf_detail(a)[1], 
+                             { i: unf.unf(row) for (i, row) in enumerate(a) })
+        a = numpy.array([['a', None], ['b', 1]], dtype=object)
+        with self.assertRaises(ValueError):
+            unf.unf(a)
+        return
+
+    def test_empty(self):
+        self.assertEqual(unf.unf(numpy.array([])), unf.unf([]))
+        return
+
+    # ---------------------------------------------------------
+    # string tests
+
+    def test_unicode(self):
+        vals = ['Hello World', '', 'p\u00e5 F\u00e6r\u00f8erne']
+        self.assertEqual(unf.unf(numpy.array(vals)), unf.unf(vals))
+        return
+
+    def test_unicode_truncation(self):
+        # truncation is by bytes, so it can split a character
+        vals = ['\u00e5' * 100, 'a' * 127 + '\u00e5', 'b' * 200, 'c' * 128]
+        self.assertEqual(unf.unf(numpy.array(vals)), unf.unf(vals))
+        return
+
+    def test_bytes(self):
+        vals = ['Hello World', '', '\u20ac' * 50]
+        a = numpy.array([ v.encode() for v in vals ])
+        self.assertEqual(a.dtype.kind, 'S')
+        self.assertEqual(unf.unf(a), unf.unf(vals))
+        return
+
+    def test_object_strings(self):
+        vals = ['Hello World', None, '', 'Testing 123', None]
+        a = numpy.array(vals, dtype=object)
+        self.assertEqual(unf.unf(a), unf.unf(vals))
+        return
+
+    def test_object_non_strings(self):
+        for val in (1, math.nan, b'bytes'):
+            a = numpy.array(['a', val], dtype=object)
+            with self.assertRaises(ValueError):
+                unf.unf(a)
+        return
+
+    def test_string_blocks(self):
+        vals = [ None if i % 7 == 0 else str(i) * (i % 50) 
+                 for i in range(1000) ]
+        a = numpy.array(vals, dtype=object)
+        with unittest.mock.patch('unf.NUMPY_BLOCK_SIZE', 64):
+            u = unf.unf(a)
+        self.assertEqual(u, unf.unf(vals))
+        return
+
+    def test_string_dim_2(self):
+        a = numpy.array([['a', 'b'], ['c', 'd']])
+        self.assertEqual(unf.unf(a), unf.unf(a[::-1]))
+        self.assertEqual(unf.unf(a[:1]), unf.unf(['a', 'b']))
+        return
+
+    # ---------------------------------------------------------
+    # block tests
+
+    def test_blocks(self):
+        a = numpy.linspace(-1e3, 1e3, 1001)
+        a[::7] = numpy.nan
+        a[::11] = 0
+        s = unf._normalize(list(a), unf.DEFAULT_DIGITS)
+        for block_size in (1, 10, 1000, 1001, 5000):
+            pieces = list(unf._normalize_numpy(a, unf.DEFAULT_DIGITS, 
+                                               block_size))
+            self.assertEqual(len(pieces), math.ceil(a.size / block_size))
+            self.assertEqual(b''.join(pieces), s)
+        return
+
+    def test_block_size_constant(self):
+        a = numpy.arange(100)
+        u = unf.unf(a)
+        with unittest.mock.patch('unf.NUMPY_BLOCK_SIZE', 7):
+            self.assertEqual(unf.unf(a), u)
+            pieces = list(unf._normalize_numpy(a, unf.DEFAULT_DIGITS))
+            self.assertEqual(len(pieces), 15)
+        return
+
+    def check_range(self, a, digits=unf.DEFAULT_DIGITS, missing=None):
+        with unittest.mock.patch('unf.VALUE_TABLE_RATIO', a.size + 1):
+            s = b''.join(unf._normalize_numpy(a, digits, missing=missing))
+        self.assertEqual(unf._format_numpy_range(a, digits, missing), s)
+        return
+
+    def test_range(self):
+        rng = numpy.random.default_rng(0)
+        self.check_range(rng.integers(1, 6, 1000))
+        self.check_range(rng.integers(1950, 2025, 2000).astype(float))
+        self.check_range(rng.integers(1950, 2025, 2000), 2)
+        self.check_range(rng.integers(-128, 128, 5000).astype('int8'))
+        self.check_range(rng.integers(0, 10, 1000).astype('uint64') 
+                         + numpy.uint64(2**64 - 10))
+        self.check_range(rng.random(1000) < 0.3)
+        return
+
+    def test_range_missing(self):
+        rng = numpy.random.default_rng(0)
+        a = rng.integers(1, 6, 1000).astype(float)
+        missing = rng.random(1000) < 0.1
+        a[missing] = numpy.nan
+        self.check_range(a, missing=missing)
+        self.check_range(rng.integers(1, 6, 1000), missing=missing)
+        return
+
+    def test_range_not_used(self):
+        for a in (numpy.arange(1000), 
+                  numpy.arange(1000) / 2, 
+                  numpy.array([0.0, -0.0, 1.0, numpy.nan] * 250), 
+                  numpy.array([0.0, 1.0, numpy.inf] * 250), 
+                  numpy.array([1, 2**62, -2**62] * 100), 
+                  numpy.arange(10)):
+            self.assertIsNone(unf._format_numpy_range(a, 7))
+        return
+
+    def test_range_unf(self):
+        a = numpy.tile(numpy.array([1, 2, 3]), 10000)
+        self.assertEqual(unf.unf(a), unf.unf([1, 2, 3] * 10000))
+        return
+
+    # ---------------------------------------------------------
+    # formatting tests
+
+    def test_format(self):
+        a = numpy.array([1.23456789, -300, 0.0, -0.0, numpy.nan, 
+                         numpy.inf, -numpy.inf, 0.00073, 1e100])
+        (buf, ends) = unf._format_numpy(a, unf.DEFAULT_DIGITS)
+        self.assertEqual(buf.dtype, numpy.uint8)
+        self.assertEqual(len(ends), len(a))
+        starts = [0] + list(ends[:-1])
+        for (v, start, end) in zip(a, starts, ends):
+            self.assertEqual(buf[start:end].tobytes(), 
+                             unf._normalize(float(v), unf.DEFAULT_DIGITS))
+        return
+
+    def test_format_missing(self):
+        a = numpy.array([1.5, numpy.nan, -2, numpy.nan])
+        missing = numpy.array([False, True, False, False])
+        (buf, ends) = unf._format_numpy(a, 7, missing)
+        s = unf._normalize([1.5, None, -2, float('nan')], 7)
+        self.assertEqual(buf.tobytes(), s)
+        self.assertEqual(list(ends), [8, 11, 18, 24])
+        return
+
+    def test_format_negative_nan(self):
+        a = numpy.array([-numpy.nan, -numpy.inf])
+        (buf, ends) = unf._format_numpy(a, 7)
+        self.assertEqual(buf.tobytes(), b'+nan\n\0-inf\n\0')
+        return
+
+    def test_format_empty(self):
+        (buf, ends) = unf._format_numpy(numpy.array([]), 7)
+        self.assertEqual(buf.size, 0)
+        self.assertEqual(ends.size, 0)
+        return
+
+    def test_format_differential(self):
+        # the NumPy formatting must match the primitive normalization 
+        # exactly, including near powers of 10, at the extremes of the 
+        # float range, and for ties
+        rng = numpy.random.default_rng(0)
+        powers = 10.0**numpy.arange(-323, 309)
+        a = numpy.concatenate([
+            rng.standard_normal(1000) * 10.0**rng.integers(-320, 308, 1000), 
+            powers, 
+            numpy.nextafter(powers, 0), 
+            numpy.nextafter(powers, numpy.inf), 
+            [5e-324, 2.2250738585072014e-308, 1.7976931348623157e308, 
+             9.99999999, 0.99999999, 1.2345635, 1.2345645, 12345635], 
+            [numpy.nan, -numpy.nan, numpy.inf, -numpy.inf, 0.0, -0.0], 
+        ])
+        a = numpy.concatenate([a, -a])
+        for digits in (1, 2, 7, 12, 15, 18):
+            (buf, ends) = unf._format_numpy(a, digits)
+            starts = [0] + list(ends[:-1])
+            for (v, start, end) in zip(a, starts, ends):
+                self.assertEqual(buf[start:end].tobytes(), 
+                                 unf._normalize(float(v), digits))
+        return
+
+    def test_many_digits(self):
+        a = numpy.array([1.23456789, 1e-300, -4.5])
+        s = unf._normalize(list(a), 20)
+        self.assertEqual(unf._normalize(a, 20), s)
+        return
+
+    def test_carry(self):
+        u = unf.unf(numpy.array([9.99999999]))
+        self.assertEqual(u, unf.unf(10))
+        return
+
     # ---------------------------------------------------------
     # value tests -- as base tests above
 
@@ -796,11 +1170,130 @@ class TestPandas(unittest.TestCase):
         return
 
     def test_series_dtype(self):
-        s = pandas.Series(['a'])
+        s = pandas.Series([1j])
         with self.assertRaises(ValueError):
             unf.unf(s)
         return
 
+    def test_series_numpy(self):
+        s = pandas.Series([1.2345678, None, 3])
+        with unittest.mock.patch('unf._normalize_numpy', 
+                                 side_effect=unf._normalize_numpy) as m:
+            u = unf.unf(s)
+        self.assertTrue(m.called)
+        self.assertEqual(u, 'UNF:6:t5y+wj7UWZB7PO0R+r6c3A==')
+        return
+
+    def test_series_missing(self):
+        vals = [1.5, None, -2, None, float('inf'), 0.0, None]
+        s = pandas.Series(vals, dtype=float)
+        for digits in (3, unf.DEFAULT_DIGITS, 20):
+            self.assertEqual(unf._normalize(s, digits), 
+                             unf._normalize(vals, digits))
+        return
+
+    def test_series_int(self):
+        s = pandas.Series([1, -300, 2**40], dtype='int64')
+        self.assertEqual(unf.unf(s), unf.unf([1, -300, 2**40]))
+        s = pandas.Series([1, 200], dtype='uint8')
+        self.assertEqual(unf.unf(s), unf.unf([1, 200]))
+        return
+
+    def test_series_bool(self):
+        s = pandas.Series([True, False, True])
+        self.assertEqual(unf.unf(s), unf.unf([True, False, True]))
+        return
+
+    # ---------------------------------------------------------
+    # extension data types
+
+    def test_series_int64(self):
+        s = pandas.Series([1, None, -300], dtype='Int64')
+        self.assertEqual(unf.unf(s), unf.unf([1, None, -300]))
+        return
+
+    def test_series_float64(self):
+        s = pandas.Series([1.2345678, None, 3], dtype='Float64')
+        self.assertEqual(unf.unf(s), 'UNF:6:t5y+wj7UWZB7PO0R+r6c3A==')
+        return
+
+    def test_series_float64_nan(self):
+        # nan is a value, not a missing value, in extension types
+        a = pandas.arrays.FloatingArray(numpy.array([1.5, numpy.nan, 3]), 
+                                        numpy.array([True, False, False]))
+        s = pandas.Series(a)
+        self.assertEqual(list(s.isna()), [True, False, False])
+        self.assertEqual(unf.unf(s), unf.unf([None, float('nan'), 3]))
+        return
+
+    def test_series_boolean(self):
+        s = pandas.Series([True, None, False], dtype='boolean')
+        self.assertEqual(unf.unf(s), unf.unf([True, None, False]))
+        return
+
+    def test_series_string(self):
+        vals = ['Hello World', None, 'p\u00e5 F\u00e6r\u00f8erne']
+        for dtype in ('string', 'str'):
+            s = pandas.Series(vals, dtype=dtype)
+            self.assertEqual(unf.unf(s), unf.unf(vals))
+        return
+
+    @unittest.skipIf(not pyarrow, 'pyarrow not installed')
+    def test_series_arrow(self):
+        # Arrow-backed series are normalized from their Arrow buffers
+        vals = ['Hello World', None, 'p\u00e5 F\u00e6r\u00f8erne', 'b' * 200]
+        arrow = pandas.ArrowDtype
+        dtypes = ['string[pyarrow]', 'str', arrow(pyarrow.string())]
+        cases = [ (pandas.Series(vals, dtype=dtype), vals) 
+                  for dtype in dtypes ]
+        cases.append((pandas.Series([1, None, 3], 
+                                    dtype=arrow(pyarrow.int64())), 
+                      [1, None, 3]))
+        cases.append((pandas.Series(pyarrow.array([1.5, float('nan'), None]), 
+                                    dtype=arrow(pyarrow.float64())), 
+                      [1.5, float('nan'), None]))
+        for (s, expected) in cases:
+            wrapped = unittest.mock.Mock(wraps=unf._normalize_arrow)
+            with unittest.mock.patch('unf._normalize_arrow', wrapped):
+                self.assertEqual(unf.unf(s), unf.unf(expected))
+            self.assertTrue(wrapped.called)
+            self.assertEqual(unf.unf_segments(s, [0, 1, len(s)]), 
+                             [unf.unf(expected[:1]), unf.unf(expected[1:])])
+        s = pandas.Series([0], dtype=arrow(pyarrow.timestamp('s')))
+        with self.assertRaises(ValueError):
+            unf.unf(s)
+        return
+
+    def test_series_object(self):
+        vals = ['Hello World', None, 'p\u00e5 F\u00e6r\u00f8erne']
+        s = pandas.Series(vals, dtype=object)
+        self.assertEqual(unf.unf(s), unf.unf(vals))
+        return
+
+    def test_series_object_nan(self):
+        # object series from read_csv() mark missing strings with nan
+        vals = ['Hello World', None, 'p\u00e5 F\u00e6r\u00f8erne', None]
+        s = pandas.Series(['Hello World', numpy.nan, 
+                           'p\u00e5 F\u00e6r\u00f8erne', pandas.NA], 
+                          dtype=object)
+        self.assertEqual(unf.unf(s), unf.unf(vals))
+        s = pandas.read_csv(io.StringIO('a,b\nx,1\n,2\n')).a
+        self.assertEqual(unf.unf(s), unf.unf(['x', None]))
+        self.assertEqual(unf.unf_segments(s, [0, 1, 2]), 
+                         [unf.unf(['x']), unf.unf([None])])
+        return
+
+    def test_series_string_truncation(self):
+        vals = ['\u00e5' * 100, None, 'b' * 200]
+        s = pandas.Series(vals, dtype='string')
+        self.assertEqual(unf.unf(s), unf.unf(vals))
+        return
+
+    def test_series_uint_digits(self):
+        s = pandas.Series([1, None, 2**40], dtype='UInt64')
+        self.assertEqual(unf.unf(s, 3), unf.unf([1, None, 2**40], 3))
+        return
+
     def test_data_frame(self):
         df = pandas.DataFrame({'a': [1.2345678, 2, 3], 'b': [4, 5, 6]})
         u = unf.unf(df)
@@ -831,6 +1324,29 @@ class TestPandas(unittest.TestCase):
         self.assertEqual(u, 'UNF:6:N6:GMsD/Sf8VOarlClFV3r3HA==')
         return
 
+    def test_data_frame_mixed(self):
+        # the short columns of a frame are formatted in batches, which 
+        # must not change their UNFs
+        df = pandas.DataFrame({
+            'a': [1.5, None, 3], 
+            'b': [1, 2, 3], 
+            'c': [4.25, 5, 6], 
+            'd': pandas.array([4, None, 6], dtype='Int64'), 
+            'e': ['x', None, 'z'], 
+            'f': pandas.array(['x', None, 'y'], dtype='string'), 
+            'g': [True, False, True], 
+            'h': [0.0, 0.0, float('nan')], 
+            'i': pandas.Series([], dtype=float).reindex(range(3)), 
+        })
+        (u, columns) = unf.unf_detail(df)
+        self.assertEqual(columns, { name: unf.unf(df[name]) for name in df })
+        digests = sorted(unf._digest(df[name], 7) for name in df)
+        self.assertEqual(u, 'UNF:6:' + unf._digest(digests, 7))
+        df['j'] = ['x', 1, 'y']
+        with self.assertRaises(ValueError):
+            unf.unf(df)
+        return
+
     def test_data_frame_digits(self):
         df = pandas.DataFrame({'a': [1.2345678, 2, 3], 'b': [4, 5, 6]})
         u = unf.unf(df, 6)
@@ -849,6 +1365,1567 @@ class TestPandas(unittest.TestCase):
         self.assertEqual(u, 'UNF:6:N6:SoKpWA1mdIXyd/7/QAqdVQ==')
         return
 
+@unittest.skipIf(not pyarrow, 'pyarrow not installed')
+class TestArrow(unittest.TestCase):
+
+    def test_int(self):
+        a = pyarrow.array([1, None, -300], type=pyarrow.int32())
+        self.assertEqual(unf.unf(a), unf.unf([1, None, -300]))
+        return
+
+    def test_float(self):
+        # nan is a value and null is a missing value
+        a = pyarrow.array([1.2345678, None, float('nan')], from_pandas=False)
+        self.assertEqual(unf.unf(a), unf.unf([1.2345678, None, float('nan')]))
+        return
+
+    def test_digits(self):
+        a = pyarrow.array([1.2345678, None, 3])
+        self.assertEqual(unf.unf(a, 6), 'UNF:6:N6:GMsD/Sf8VOarlClFV3r3HA==')
+        return
+
+    def test_slice(self):
+        vals = [ None if i % 3 == 0 else i / 7 for i in range(100) ]
+        a = pyarrow.array(vals)[13:61]
+        self.assertEqual(unf.unf(a), unf.unf(vals[13:61]))
+        return
+
+    def test_bool(self):
+        vals = [True, None, False, True, True, False, False, True, True]
+        a = pyarrow.array(vals)[1:]
+        self.assertEqual(unf.unf(a), unf.unf(vals[1:]))
+        return
+
+    def test_string(self):
+        vals = ['Hello World', None, 'Testing 123']
+        for type in (pyarrow.string(), pyarrow.large_string()):
+            a = pyarrow.array(vals, type=type)
+            self.assertEqual(unf.unf(a), unf.unf(vals))
+        return
+
+    def test_string_slice(self):
+        vals = [ None if i % 5 == 0 else '\u00e5' * i for i in range(100) ]
+        for type in (pyarrow.string(), pyarrow.large_string()):
+            a = pyarrow.array(vals, type=type)[17:83]
+            self.assertEqual(unf.unf(a), unf.unf(vals[17:83]))
+        return
+
+    def test_string_empty(self):
+        vals = ['', None, '']
+        self.assertEqual(unf.unf(pyarrow.array(vals)), unf.unf(vals))
+        return
+
+    def test_dictionary(self):
+        vals = ['a', 'b', None, 'a']
+        a = pyarrow.array(vals).dictionary_encode()
+        self.assertEqual(unf.unf(a), unf.unf(vals))
+        return
+
+    def test_null(self):
+        a = pyarrow.array([None, None])
+        self.assertEqual(unf.unf(a), unf.unf([None, None]))
+        return
+
+    def test_unsupported(self):
+        a = pyarrow.array([b'a', b'b'])
+        with self.assertRaises(ValueError):
+            unf.unf(a)
+        return
+
+    def test_chunked_array(self):
+        a = pyarrow.chunked_array([[1.2345678], [], [2, 3]])
+        self.assertEqual(unf.unf(a), 'UNF:6:Gu/iYw2g7MIfVrNo1t4+zQ==')
+        return
+
+    def test_table(self):
+        t = pyarrow.table({'a': [1.2345678, 2, 3], 'b': [4, 5, 6]})
+        self.assertEqual(unf.unf(t), 'UNF:6:qs7MinjKNf+1+wy/RfVNvA==')
+        self.assertEqual(unf.unf(t.to_batches()[0]), 
+                         'UNF:6:qs7MinjKNf+1+wy/RfVNvA==')
+        return
+
+    def test_table_mixed(self):
+        # the short columns of a table are formatted in batches, which 
+        # must not change their UNFs
+        t = pyarrow.table({
+            'a': [1.5, None, 3.0], 
+            'b': pyarrow.chunked_array([[1, 2], [None]]), 
+            's': ['x', None, 'y'], 
+            'd': pyarrow.array(['p', 'q', None]).dictionary_encode(), 
+            'n': pyarrow.nulls(3), 
+            'f': [True, None, False], 
+        })
+        (u, columns) = unf.unf_detail(t)
+        self.assertEqual(columns, { name: unf.unf(t[name]) 
+                                    for name in t.column_names })
+        return
+
+    def test_table_1(self):
+        t = pyarrow.table({'a': [1.2345678, 2, 3]})
+        self.assertEqual(unf.unf(t), 'UNF:6:Gu/iYw2g7MIfVrNo1t4+zQ==')
+        return
+
+    def test_hasher(self):
+        h = unf.UNFHasher()
+        h.update(pyarrow.array([1.2345678, None]))
+        h.update(pyarrow.chunked_array([[3]]))
+        self.assertEqual(h.unf(), 'UNF:6:t5y+wj7UWZB7PO0R+r6c3A==')
+        with self.assertRaises(TypeError):
+            h.update(pyarrow.table({'a': [1]}))
+        return
+
+@unittest.skipIf(not numpy, 'numpy not installed')
+class TestMmap(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'data')
+        return
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+        return
+
+    def test_npy(self):
+        a = numpy.arange(1000) / 7
+        numpy.save(self.path + '.npy', a)
+        self.assertEqual(unf.unf_mmap(self.path + '.npy'), unf.unf(a))
+        return
+
+    def test_windows(self):
+        a = numpy.arange(1000) / 7
+        numpy.save(self.path + '.npy', a)
+        with unittest.mock.patch('unf.MMAP_WINDOW_BYTES', 800):
+            u = unf.unf_mmap(self.path + '.npy')
+        self.assertEqual(u, unf.unf(a))
+        return
+
+    def test_digits(self):
+        a = numpy.arange(1000) / 7
+        numpy.save(self.path + '.npy', a)
+        u = unf.unf_mmap(self.path + '.npy', 4)
+        self.assertEqual(u, unf.unf(a, 4))
+        return
+
+    def test_raw(self):
+        a = numpy.arange(-500, 500, dtype='<i8')
+        with open(self.path, 'wb') as f:
+            f.write(b'header')
+            f.write(a.tobytes())
+        u = unf.unf_mmap(self.path, dtype='<i8', offset=6)
+        self.assertEqual(u, unf.unf(a))
+        return
+
+    def test_2d(self):
+        a = numpy.arange(3000).reshape((30, 100)) / 7
+        numpy.save(self.path + '.npy', a)
+        with unittest.mock.patch('unf.MMAP_WINDOW_BYTES', 160):
+            u = unf.unf_mmap(self.path + '.npy')
+        self.assertEqual(u, unf.unf(a))
+        return
+
+    def test_2d_fortran(self):
+        a = numpy.asfortranarray(numpy.arange(3000).reshape((30, 100)) / 7)
+        numpy.save(self.path + '.npy', a)
+        with unittest.mock.patch('unf.MMAP_WINDOW_BYTES', 800):
+            self.assertEqual(unf.unf_mmap(self.path + '.npy'), unf.unf(a))
+            # long rows are read by columns
+            with unittest.mock.patch('unf.MMAP_MIN_COLUMNS', 3), \
+                 unittest.mock.patch('unf.NUMPY_BLOCK_SIZE', 64):
+                u = unf.unf_mmap(self.path + '.npy')
+        self.assertEqual(u, unf.unf(a))
+        return
+
+    def test_2d_short_rows(self):
+        a = numpy.arange(3000).reshape((1000, 3)) / 7
+        for order in ('C', 'F'):
+            numpy.save(self.path + '.npy', numpy.asarray(a, order=order))
+            with unittest.mock.patch('unf.MMAP_WINDOW_BYTES', 800), \
+                 unittest.mock.patch('unf._digest') as digest:
+                u = unf.unf_mmap(self.path + '.npy')
+            digest.assert_not_called()
+            self.assertEqual(u, unf.unf(a))
+        return
+
+    def test_raw_fortran(self):
+        a = numpy.arange(3000, dtype='<f8').reshape((30, 100)) / 7
+        with open(self.path, 'wb') as f:
+            f.write(a.tobytes(order='F'))
+        u = unf.unf_mmap(self.path, dtype='<f8', shape=(30, 100), order='F')
+        self.assertEqual(u, unf.unf(a))
+        return
+
+    def test_2d_one_row(self):
+        a = numpy.arange(100).reshape((1, 100))
+        numpy.save(self.path + '.npy', a)
+        self.assertEqual(unf.unf_mmap(self.path + '.npy'), unf.unf(a[0]))
+        return
+
+    def test_3d(self):
+        numpy.save(self.path + '.npy', numpy.zeros((2, 3, 4)))
+        with self.assertRaises(ValueError):
+            unf.unf_mmap(self.path + '.npy')
+        return
+
+class TestResume(unittest.TestCase):
+
+    def test_sha256(self):
+        data = bytes(range(256)) * 3
+        for n in (0, 1, 55, 56, 63, 64, 65, 200, len(data)):
+            h = unf._SHA256()
+            h.update(data[:n])
+            h = unf._SHA256(h.state())
+            h.update(data[n:])
+            self.assertEqual(h.digest(), hashlib.sha256(data).digest())
+        return
+
+    def test_sha256_python(self):
+        data = bytes(range(256)) * 3
+        with unittest.mock.patch('unf._libcrypto', lambda: None):
+            h = unf._SHA256()
+            self.assertIsNone(h._lib)
+            h.update(data[:100])
+            h2 = h.copy()
+            h2.update(data[100:])
+            self.assertEqual(h2.digest(), hashlib.sha256(data).digest())
+            state = h.state()
+        # states are portable between the implementations
+        h = unf._SHA256(state)
+        h.update(data[100:])
+        self.assertEqual(h.digest(), hashlib.sha256(data).digest())
+        return
+
+    def test_libcrypto(self):
+        # the library hashlib uses is found
+        self.assertIsNotNone(unf._libcrypto())
+        with unittest.mock.patch('ctypes.CDLL', side_effect=OSError):
+            with self.assertWarns(RuntimeWarning):
+                self.assertIsNone(unf._libcrypto.__wrapped__())
+        return
+
+    def test_sha256_bad_state(self):
+        for state in (b'', b'\0' * 40 + b'x'):
+            with self.assertRaises(ValueError):
+                unf._SHA256(state)
+        return
+
+    def test_hasher(self):
+        h = unf.UNFHasher(resumable=True)
+        h.update(1.23456789)
+        h = unf.UNFHasher.from_state(h.state())
+        self.assertEqual(h.count, 1)
+        h.update([None, 0])
+        self.assertEqual(h.count, 3)
+        self.assertEqual(h.unf(), 'UNF:6:Do5dfAoOOFt4FSj0JcByEw==')
+        self.assertEqual(h.copy().unf(), 'UNF:6:Do5dfAoOOFt4FSj0JcByEw==')
+        return
+
+    def test_hasher_digits(self):
+        h = unf.UNFHasher(6, resumable=True)
+        h.update([1.2345678, None, 3])
+        h = unf.UNFHasher.from_state(h.state())
+        self.assertEqual(h.digits, 6)
+        self.assertEqual(h.unf(), 'UNF:6:N6:GMsD/Sf8VOarlClFV3r3HA==')
+        return
+
+    def test_hasher_not_resumable(self):
+        with self.assertRaises(TypeError):
+            unf.UNFHasher().state()
+        return
+
+    def test_bad_state(self):
+        h = unf.UNFHasher(resumable=True)
+        state = h.state()
+        for bad in (None, '', state[1:], '5' + state[1:], state + 'x'):
+            with self.assertRaises(ValueError):
+                unf.UNFHasher.from_state(bad)
+        return
+
+    def test_vector(self):
+        (u, state) = unf.unf_resume([1.23456789])
+        self.assertEqual(u, unf.unf([1.23456789]))
+        state = json.loads(json.dumps(state))
+        (u, state) = unf.unf_resume([None, 0], state)
+        self.assertEqual(u, 'UNF:6:Do5dfAoOOFt4FSj0JcByEw==')
+        return
+
+    def test_digits(self):
+        (u, state) = unf.unf_resume([1.2345678], digits=6)
+        (u, state) = unf.unf_resume([None, 3], state, 6)
+        self.assertEqual(u, 'UNF:6:N6:GMsD/Sf8VOarlClFV3r3HA==')
+        with self.assertRaises(ValueError):
+            unf.unf_resume([4], state)
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_data_frame(self):
+        df = pandas.DataFrame({'a': [1.2345678, 2, 3], 'b': [4, 5, 6]})
+        (u, state) = unf.unf_resume(df.iloc[:1])
+        self.assertEqual(u, unf.unf(df.iloc[:1]))
+        state = json.loads(json.dumps(state))
+        (u, state) = unf.unf_resume(df.iloc[1:], state)
+        self.assertEqual(u, 'UNF:6:qs7MinjKNf+1+wy/RfVNvA==')
+        with self.assertRaises(ValueError):
+            unf.unf_resume(df[['a']], state)
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_numpy(self):
+        # the rows of a 2-D array are the vectors, so they are extended
+        a = numpy.array([[1.2345678, 2, 3], [4, 5, 6]])
+        (u, state) = unf.unf_resume(a[:,:2])
+        (u, state) = unf.unf_resume(a[:,2:], state)
+        self.assertEqual(u, 'UNF:6:qs7MinjKNf+1+wy/RfVNvA==')
+        return
+
+class TestExponents(unittest.TestCase):
+
+    """Compare the frexp() exponents with the log10() exponents."""
+
+    def values(self):
+        # powers of 10 and the floats around them, ties and near-ties 
+        # (at 7 digits), subnormals, and the extremes
+        values = [5e-324, 1e-310, 2.2250738585072014e-308, 
+                  1.7976931348623157e308, 
+                  1.2345635, 1.2345645, 9.9999995, 0.99999995, 
+                  1.23456785e-300, 9.99999949999e200]
+        for n in range(-323, 309):
+            x = float(10**n) if n >= 0 else 10**n
+            values.append(x)
+            (below, above) = (x, x)
+            for i in range(3):
+                below = math.nextafter(below, 0)
+                above = math.nextafter(above, math.inf)
+                values.extend([below, above])
+        return [ x for x in values if x > 0 ]
+
+    def check(self, values, digits):
+        for x in values:
+            with unittest.mock.patch('unf.FREXP_EXPONENTS', True):
+                exp = unf._exponent(x)
+                normalized = unf._normalize_number(x, digits)
+            self.assertEqual(exp, math.floor(math.log10(x)), x)
+            self.assertEqual(normalized, unf._normalize_number(x, digits), x)
+        return
+
+    def test_scalar(self):
+        for digits in (1, 2, 7, 15, 17, 20):
+            self.check(self.values(), digits)
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_numpy(self):
+        rng = numpy.random.default_rng(0)
+        bits = rng.integers(0, 2**63, 100000, dtype='uint64')
+        random = bits.view('float64')
+        random = random[numpy.isfinite(random) & (random != 0)]
+        scattered = rng.standard_normal(10000) * \
+                    10.0**rng.integers(-300, 300, 10000)
+        ties = (rng.integers(10**6, 10**7, 10000) + 0.5) * \
+               10.0**rng.integers(-300, 300, 10000)
+        data = numpy.concatenate([self.values(), -random, scattered, ties])
+        for digits in (1, 2, 3, 7, 9, 15, 17, 18):
+            expected = unf._format_numpy(data, digits)
+            with unittest.mock.patch('unf.FREXP_EXPONENTS', True):
+                (buf, ends) = unf._format_numpy(data, digits)
+            self.assertTrue(numpy.array_equal(buf, expected[0]))
+            self.assertTrue(numpy.array_equal(ends, expected[1]))
+        self.check(random[:1000].tolist(), 7)
+        self.check(ties[:1000].tolist(), 7)
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_unf(self):
+        a = numpy.array([1.2345635, 1e-320, -9.9999995, 0, numpy.nan])
+        with unittest.mock.patch('unf.FREXP_EXPONENTS', True):
+            u = unf.unf(a)
+        self.assertEqual(u, unf.unf(a))
+        return
+
+class TestDetail(unittest.TestCase):
+
+    def test_vector(self):
+        val = [1.23456789, None, 0]
+        u = 'UNF:6:Do5dfAoOOFt4FSj0JcByEw=='
+        self.assertEqual(unf.unf_detail(val), (u, {None: u}))
+        u = unf.unf(1.23456789, 9)
+        self.assertEqual(unf.unf_detail(1.23456789, 9), (u, {None: u}))
+        with self.assertRaises(ValueError):
+            unf.unf_detail(val, 0)
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_data_frame(self):
+        df = pandas.DataFrame({'a': [1.5, 2], 'b': [3, 4], 'c': ['x', 'y']})
+        (u, columns) = unf.unf_detail(df, 9)
+        self.assertEqual(u, unf.unf(df, 9))
+        self.assertEqual(list(columns), ['a', 'b', 'c'])
+        for name in df:
+            self.assertEqual(columns[name], unf.unf(df[name], 9))
+        self.assertEqual(unf.verify(df, u, columns), (True, None))
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_array(self):
+        a = numpy.array([[1, 2], [3, 4]])
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            (u, rows) = unf.unf_detail(a, executor=executor)
+        self.assertEqual(u, unf.unf(a))
+        self.assertEqual(rows, {0: unf.unf([1, 2]), 1: unf.unf([3, 4])})
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_cache(self):
+        a = numpy.array([[1, 2], [3, 4]])
+        with tempfile.TemporaryDirectory() as tempdir:
+            cache = unf.UNFCache(os.path.join(tempdir, 'cache.db'))
+            expected = unf.unf_detail(a)
+            self.assertEqual(unf.unf_detail(a, cache=cache), expected)
+            with unittest.mock.patch('unf._normalize_numpy') as normalize, \
+                 unittest.mock.patch('unf._format_vector') as format:
+                self.assertEqual(unf.unf_detail(a, cache=cache), expected)
+                normalize.assert_not_called()
+                format.assert_not_called()
+            cache.close()
+        return
+
+class TestVerify(unittest.TestCase):
+
+    def test_verify(self):
+        val = [1.23456789, None, 0]
+        u = 'UNF:6:Do5dfAoOOFt4FSj0JcByEw=='
+        self.assertEqual(unf.verify(val, u), (True, None))
+        self.assertEqual(unf.verify([1.23456789, None], u), (False, None))
+        return
+
+    def test_digits(self):
+        self.assertEqual(unf.verify(1.23456789, 
+                                    'UNF:6:N9:IKw+l4ywdwsJeDze8dplJA=='), 
+                         (True, None))
+        self.assertEqual(unf.verify(1.23456789, 
+                                    'UNF:6:N7:vcKELUSS4s4k1snF4OTB9A=='), 
+                         (True, None))
+        self.assertEqual(unf.verify(1.23456789, 
+                                    'UNF:6:N8:vcKELUSS4s4k1snF4OTB9A=='), 
+                         (False, None))
+        return
+
+    def test_bad_unf(self):
+        for u in ('vcKELUSS4s4k1snF4OTB9A==', 
+                  'UNF:5:vcKELUSS4s4k1snF4OTB9A==', 
+                  'UNF:6:N0:vcKELUSS4s4k1snF4OTB9A==', 
+                  'UNF:6:X128:vcKELUSS4s4k1snF4OTB9A=='):
+            with self.assertRaises(ValueError):
+                unf.verify(1.23456789, u)
+        return
+
+    def test_per_vector(self):
+        # a single vector is named None, as by unf_detail()
+        (u, vectors) = unf.unf_detail([1.5, 2])
+        self.assertEqual(unf.verify([1.5, 2], u, vectors), (True, None))
+        self.assertEqual(unf.verify([1.5, 3], u, vectors), (False, None))
+        self.assertEqual(unf.verify([1.5, 2], u, {0: u}), (False, 0))
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_per_vector_series(self):
+        s = pandas.Series([1.5, None, 3])
+        (u, vectors) = unf.unf_detail(s)
+        self.assertEqual(vectors, {None: u})
+        self.assertEqual(unf.verify(s, u, vectors), (True, None))
+        self.assertEqual(unf.verify(s + 1, u, vectors), (False, None))
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_per_column(self):
+        df = pandas.DataFrame({'a': [1.5, 2], 'b': [3, 4], 'c': ['x', 'y']})
+        u = unf.unf(df, 9)
+        columns = { name: unf.unf(df[name], 9) for name in df }
+        self.assertEqual(unf.verify(df, u, columns), (True, None))
+        self.assertEqual(unf.verify(df, u, {'c': columns['c']}), 
+                         (True, None))
+        changed = df.assign(b=[3, 5])
+        self.assertEqual(unf.verify(changed, u, columns), (False, 'b'))
+        self.assertEqual(unf.verify(changed, u), (False, None))
+        # verification stops at the first mismatch
+        with unittest.mock.patch('unf._digest', wraps=unf._digest) as digest:
+            self.assertEqual(unf.verify(changed, u, columns), (False, 'b'))
+            self.assertEqual(digest.call_count, 2)
+            self.assertEqual(unf.verify(df, u, dict(columns, d=u)), 
+                             (False, 'd'))
+            self.assertEqual(digest.call_count, 2)
+        with self.assertRaises(ValueError):
+            unf.verify(df, u, {'a': unf.unf(df['a'])})
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_per_row(self):
+        a = numpy.array([[1, 2], [3, 4]])
+        u = unf.unf(a)
+        rows = {0: unf.unf([1, 2]), 1: unf.unf([3, 4])}
+        self.assertEqual(unf.verify(a, u, rows), (True, None))
+        self.assertEqual(unf.verify(a[::-1], u, rows), (False, 0))
+        return
+
+class TestHashing(unittest.TestCase):
+
+    class Recorder:
+
+        """A SHA-256 provider recording the chunks it is given."""
+
+        def __init__(self, data=b''):
+            self.hash = hashlib.sha256(data)
+            self.chunks = []
+            return
+
+        def update(self, data):
+            self.chunks.append(len(data))
+            self.hash.update(data)
+            return
+
+        def digest(self):
+            return self.hash.digest()
+
+    def test_pieces(self):
+        pieces = [b'a' * 10, b'b' * 1000, b'', b'c' * 100]
+        for cpus in (1, 4):
+            with unittest.mock.patch('os.cpu_count', return_value=cpus), \
+                 unittest.mock.patch('unf.HASH_CHUNK_BYTES', 64):
+                hash = unf._hash_pieces(self.Recorder(), iter(pieces))
+            self.assertEqual(hash.digest(), 
+                             hashlib.sha256(b''.join(pieces)).digest())
+            self.assertLessEqual(max(hash.chunks), 64)
+            hash = unf._hash_pieces(self.Recorder(), [])
+            self.assertEqual(hash.digest(), hashlib.sha256().digest())
+        return
+
+    def test_provider(self):
+        recorders = []
+        def provider(data=b''):
+            recorders.append(self.Recorder(data))
+            return recorders[-1]
+        data = [1.23456789, None, 0]
+        with unittest.mock.patch('unf.SHA256', provider):
+            u = unf.unf(data)
+            h = unf.UNFHasher()
+            h.update(data)
+        self.assertEqual(u, 'UNF:6:Do5dfAoOOFt4FSj0JcByEw==')
+        self.assertEqual(h.unf(), u)
+        self.assertEqual(len(recorders), 2)
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_provider_segments(self):
+        recorders = []
+        def provider(data=b''):
+            recorders.append(self.Recorder(data))
+            return recorders[-1]
+        a = numpy.arange(100) / 7
+        expected = unf.unf_segments(a, [0, 10, 100])
+        with unittest.mock.patch('unf.SHA256', provider), \
+             unittest.mock.patch('unf.NUMPY_BLOCK_SIZE', 50):
+            self.assertEqual(unf.unf_segments(a, [0, 10, 100]), expected)
+        # one short segment, and one long segment hashed by blocks
+        self.assertEqual(len(recorders), 2)
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_blocks(self):
+        a = numpy.arange(1000) / 7
+        expected = unf.unf(a.tolist())
+        for cpus in (1, 4):
+            with unittest.mock.patch('os.cpu_count', return_value=cpus), \
+                 unittest.mock.patch('unf.NUMPY_BLOCK_SIZE', 64), \
+                 unittest.mock.patch('unf.HASH_CHUNK_BYTES', 100):
+                self.assertEqual(unf.unf(a), expected)
+                h = unf.UNFHasher()
+                h.update(a)
+                self.assertEqual(h.unf(), expected)
+        return
+
+class TestFastCheck(unittest.TestCase):
+
+    def test_header(self):
+        f = unf.fast_check([1.23456789, None, 0])
+        self.assertTrue(f.startswith(unf.FAST_CHECK_HEADER))
+        self.assertFalse(f.startswith('UNF:'))
+        self.assertEqual(len(f), len(unf.FAST_CHECK_HEADER) + 24)
+        return
+
+    def test_changes(self):
+        self.assertEqual(unf.fast_check([1, 2, 3]), unf.fast_check([1, 2, 3]))
+        self.assertNotEqual(unf.fast_check([1, 2, 3]), 
+                            unf.fast_check([1, 2, 4]))
+        # no rounding
+        self.assertNotEqual(unf.fast_check(1.23456789), 
+                            unf.fast_check(1.23456788))
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_numpy(self):
+        a = numpy.arange(12).reshape(3, 4) / 7
+        self.assertEqual(unf.fast_check(a), unf.fast_check(a[::-1]))
+        self.assertEqual(unf.fast_check(a[:1]), unf.fast_check(a[0]))
+        b = a.copy()
+        b[1,2] = 0
+        self.assertNotEqual(unf.fast_check(a), unf.fast_check(b))
+        # the data type counts
+        self.assertNotEqual(unf.fast_check(numpy.arange(3)), 
+                            unf.fast_check(numpy.arange(3.0)))
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_pandas(self):
+        df = pandas.DataFrame({'a': [1, 2, 3], 'b': ['x', None, 'z']})
+        self.assertEqual(unf.fast_check(df), unf.fast_check(df[['b', 'a']]))
+        df2 = df.copy()
+        df2.loc[1, 'b'] = 'y'
+        self.assertNotEqual(unf.fast_check(df), unf.fast_check(df2))
+        s = pandas.Series([1, None, 3], dtype='Int64')
+        t = pandas.Series([1, 0, 3], dtype='Int64')
+        self.assertNotEqual(unf.fast_check(s), unf.fast_check(t))
+        return
+
+    @unittest.skipIf(not pyarrow, 'pyarrow not installed')
+    def test_arrow_logical(self):
+        # the same logical values give the same fast check, whatever 
+        # the chunking, slicing, or bytes under nulls
+        for (values, other) in (([1.5, None, 3.25, 4.0, None], 0.0), 
+                                ([1, None, 3, 4, None], 0), 
+                                ([True, None, False, True, None], False), 
+                                (['ab', None, 'c', '', None], 'zz')):
+            a = pyarrow.array(values)
+            f = unf.fast_check(a)
+            chunked = pyarrow.chunked_array([values[:2], [], values[2:]], 
+                                            type=a.type)
+            self.assertTrue(chunked.equals(pyarrow.chunked_array([a])))
+            self.assertEqual(unf.fast_check(chunked), f)
+            longer = pyarrow.array([other] + values + [other])
+            self.assertEqual(unf.fast_check(longer.slice(1, len(values))), f)
+            # the same values and validity, with other bytes under nulls
+            filled = pyarrow.array([ other if v is None else v 
+                                     for v in values ], type=a.type)
+            buffers = [a.buffers()[0]] + filled.buffers()[1:]
+            garbage = pyarrow.Array.from_buffers(a.type, 
+                                                 len(a), 
+                                                 buffers, 
+                                                 a.null_count)
+            self.assertTrue(garbage.equals(a))
+            self.assertEqual(unf.fast_check(garbage), f)
+            self.assertNotEqual(unf.fast_check(filled), f)
+            # a slice of a dictionary array keeps the whole dictionary
+            d = a.dictionary_encode()
+            self.assertEqual(unf.fast_check(d.slice(2)), 
+                             unf.fast_check(a.slice(2).dictionary_encode()))
+        t1 = pyarrow.table({'a': [1.5, None, 3.0], 'b': ['x', None, 'z']})
+        t2 = pyarrow.concat_tables([t1.slice(0, 1), t1.slice(1)])
+        self.assertTrue(t1.equals(t2))
+        self.assertEqual(unf.fast_check(t1), unf.fast_check(t2))
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_normalized(self):
+        # vectors that can't be read raw are normalized
+        s = pandas.Series([1, None], dtype='Int64')
+        with unittest.mock.patch('unf._content_hash', return_value=None):
+            f = unf.fast_check(s)
+        expected = hashlib.sha256(unf._normalize(s, unf.NUMPY_MAX_DIGITS))
+        self.assertEqual(f, unf.FAST_CHECK_HEADER + 
+                            base64.b64encode(expected.digest()[:16]).decode())
+        return
+
+class TestProfile(unittest.TestCase):
+
+    def test_calls(self):
+        data = [1.23456789, None, 0]
+        with unf.UNFProfile() as profile:
+            u = unf.unf(data)
+            unf.unf('abc', 9)
+        self.assertEqual(u, 'UNF:6:Do5dfAoOOFt4FSj0JcByEw==')
+        unf.unf(data)
+        self.assertEqual(len(profile.calls), 2)
+        call = profile.calls[0]
+        self.assertEqual(call['digits'], 7)
+        self.assertEqual(call['elements'], 3)
+        self.assertEqual(call['bytes'], len(unf._normalize(data, 7)))
+        self.assertEqual(set(call['stages']), {'list', 'hash'})
+        self.assertGreaterEqual(call['seconds'], sum(call['stages'].values()))
+        self.assertIsNone(call['peak_memory'])
+        self.assertEqual(set(profile.calls[1]['stages']), 
+                         {'primitive', 'hash'})
+        totals = profile.totals()
+        self.assertEqual(totals['calls'], 2)
+        self.assertEqual(totals['elements'], 4)
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_collection(self):
+        df = pandas.DataFrame({'a': [1.5, 2, 3], 'b': ['x', 'y', None]})
+        with unf.UNFProfile() as profile:
+            u = unf.unf(df)
+        self.assertEqual(u, unf.unf(df))
+        self.assertEqual(len(profile.calls), 1)
+        call = profile.calls[0]
+        self.assertEqual(call['elements'], 6)
+        self.assertEqual(set(call['stages']), {'pandas', 'collection', 'hash'})
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_detail_verify(self):
+        df = pandas.DataFrame({'a': [1.5, 2, 3], 'b': ['x', 'y', None]})
+        with unf.UNFProfile() as profile:
+            (u, columns) = unf.unf_detail(df)
+            unf.verify(df, u, columns)
+            unf.unf_resume(df)
+        # one call each, with the vectors' work (and not the combining 
+        # of digests, or unf_resume(), as calls of their own)
+        self.assertEqual(len(profile.calls), 2)
+        for call in profile.calls:
+            self.assertEqual(call['elements'], 6)
+            self.assertEqual(set(call['stages']), {'pandas', 'hash'})
+        return
+
+    def test_nested(self):
+        with unf.UNFProfile() as outer:
+            with unf.UNFProfile() as inner:
+                unf.unf(1)
+            unf.unf(2)
+        self.assertEqual(len(inner.calls), 1)
+        self.assertEqual(len(outer.calls), 1)
+        self.assertIsNone(unf._profile)
+        return
+
+    def test_memory(self):
+        with unf.UNFProfile(memory=True) as profile:
+            unf.unf(list(range(1000)))
+        self.assertGreater(profile.calls[0]['peak_memory'], 0)
+        self.assertFalse(tracemalloc.is_tracing())
+        return
+
+    def test_logger(self):
+        logger = logging.getLogger('test_unf')
+        with self.assertLogs(logger, 'INFO') as logs:
+            with unf.UNFProfile(logger=logger) as profile:
+                unf.unf([1, 2, 3])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIs(logs.records[0].unf_profile, profile.calls[0])
+        return
+
+    def test_error(self):
+        with unf.UNFProfile() as profile:
+            with self.assertRaises(TypeError):
+                unf.unf([[1]])
+            unf.unf(1)
+        self.assertEqual(len(profile.calls), 1)
+        return
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_cases(self):
+        for (name, (package, make, single)) in benchmarks.CASES.items():
+            if package is not None and globals()[package] is None:
+                continue
+            with unittest.mock.patch('benchmarks.MIN_TIME', 0):
+                result = benchmarks.run_case(name, 10, 7)
+            self.assertEqual(result['size'], 1 if single else 10)
+            self.assertGreater(result['elements_per_second'], 0)
+            self.assertGreater(result['mb_per_second'], 0)
+        return
+
+    def test_settings(self):
+        with unittest.mock.patch('benchmarks.MIN_TIME', 0), \
+             unittest.mock.patch('unf.NUMPY_BLOCK_SIZE', 2**16):
+            benchmarks.run_case('scalar-int', 1, 7, {'NUMPY_BLOCK_SIZE': 8})
+            self.assertEqual(unf.NUMPY_BLOCK_SIZE, 8)
+            with self.assertRaises(ValueError):
+                benchmarks.run_case('scalar-int', 1, 7, {'NO_SUCH': 1})
+        return
+
+    def test_normalized_bytes(self):
+        self.assertEqual(benchmarks._normalized_bytes([1, None], 7), 10)
+        return
+
+class TestAsync(unittest.TestCase):
+
+    def test_aunf(self):
+        for obj in (1.23456789, 'abc', [1.23456789, None, 0], []):
+            self.assertEqual(asyncio.run(unf.aunf(obj)), unf.unf(obj))
+        self.assertEqual(asyncio.run(unf.aunf([1.23456789, None, 0], 9)), 
+                         unf.unf([1.23456789, None, 0], 9))
+        with self.assertRaises(ValueError):
+            asyncio.run(unf.aunf(1, 0))
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_numpy(self):
+        a = numpy.arange(100) / 7
+        m = numpy.arange(20).reshape(4, 5) / 3
+        with unittest.mock.patch('unf.ASYNC_SLICE_SIZE', 8):
+            self.assertEqual(asyncio.run(unf.aunf(a)), unf.unf(a))
+            self.assertEqual(asyncio.run(unf.aunf(m)), unf.unf(m))
+            self.assertEqual(asyncio.run(unf.aunf(m[:1])), unf.unf(m[0]))
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_pandas(self):
+        s = pandas.Series([1.5, None, 3] * 10, index=range(30, 0, -1))
+        df = pandas.DataFrame({'a': s.to_numpy(), 'b': ['x', None, 'y'] * 10})
+        with unittest.mock.patch('unf.ASYNC_SLICE_SIZE', 7):
+            self.assertEqual(asyncio.run(unf.aunf(s)), unf.unf(s))
+            self.assertEqual(asyncio.run(unf.aunf(df)), unf.unf(df))
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_slices_in_flight(self):
+        # slices normalized but not yet hashed are bounded by the 
+        # executor's workers
+        m = numpy.arange(400).reshape(20, 20) / 3
+        lock = threading.Lock()
+        (in_flight, most) = (0, 0)
+        normalize = unf._normalize
+        def counted_normalize(data, digits):
+            nonlocal in_flight, most
+            string = normalize(data, digits)
+            if not isinstance(data, numpy.ndarray):
+                # the digests of the rows
+                return string
+            with lock:
+                in_flight += 1
+                most = max(most, in_flight)
+            return string
+        class CountedSHA256:
+            def __init__(self, *args):
+                self._hash = hashlib.sha256(*args)
+            def update(self, data):
+                nonlocal in_flight
+                with lock:
+                    in_flight -= 1
+                self._hash.update(data)
+            def digest(self):
+                return self._hash.digest()
+        with concurrent.futures.ThreadPoolExecutor(3) as executor, \
+             unittest.mock.patch('unf.ASYNC_SLICE_SIZE', 4), \
+             unittest.mock.patch('unf._normalize', counted_normalize), \
+             unittest.mock.patch('unf.SHA256', CountedSHA256):
+            u = asyncio.run(unf.aunf(m, executor=executor))
+        self.assertEqual(u, unf.unf(m))
+        self.assertEqual(in_flight, 0)
+        self.assertLessEqual(most, 3)
+        return
+
+    @unittest.skipIf(not pyarrow, 'pyarrow not installed')
+    def test_arrow(self):
+        t = pyarrow.table({'a': [1, None, 3] * 5, 'b': ['x', 'y', None] * 5})
+        with unittest.mock.patch('unf.ASYNC_SLICE_SIZE', 4):
+            self.assertEqual(asyncio.run(unf.aunf(t)), unf.unf(t))
+        return
+
+    def test_executor(self):
+        data = [1.23456789, None, 0, 'a'] * 10
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            with unittest.mock.patch('unf.ASYNC_SLICE_SIZE', 8):
+                u = asyncio.run(unf.aunf(data, executor=executor))
+        self.assertEqual(u, unf.unf(data))
+        return
+
+    def test_interleaving(self):
+        # the event loop runs other tasks between slices
+        ticks = []
+        async def tick():
+            while True:
+                ticks.append(None)
+                await asyncio.sleep(0)
+        async def run():
+            task = asyncio.create_task(tick())
+            await asyncio.sleep(0)
+            n = len(ticks)
+            u = await unf.aunf(list(range(100)))
+            task.cancel()
+            return (u, len(ticks) - n)
+        with unittest.mock.patch('unf.ASYNC_SLICE_SIZE', 10):
+            (u, n) = asyncio.run(run())
+        self.assertEqual(u, unf.unf(list(range(100))))
+        self.assertGreaterEqual(n, 10)
+        return
+
+    def test_hash_thread(self):
+        # slices are hashed off the event loop's thread, in order
+        class Recorder:
+            def __init__(self):
+                (self.hash, self.threads) = (hashlib.sha256(), [])
+            def update(self, data):
+                self.threads.append(threading.get_ident())
+                self.hash.update(data)
+        async def run(h):
+            await h.aupdate(list(range(100)))
+            return threading.get_ident()
+        h = unf.UNFHasher()
+        h._hash = Recorder()
+        with unittest.mock.patch('unf.ASYNC_SLICE_SIZE', 10):
+            loop_thread = asyncio.run(run(h))
+        self.assertEqual(len(h._hash.threads), 10)
+        self.assertNotIn(loop_thread, h._hash.threads)
+        h._hash = h._hash.hash
+        self.assertEqual(h.unf(), unf.unf(list(range(100))))
+        return
+
+    def test_hasher(self):
+        async def chunks():
+            yield 1.23456789
+            yield [None, 0]
+        async def run(chunks):
+            h = unf.UNFHasher()
+            await h.aupdate_from(chunks)
+            return h
+        h = asyncio.run(run(chunks()))
+        self.assertEqual(h.unf(), 'UNF:6:Do5dfAoOOFt4FSj0JcByEw==')
+        self.assertEqual(h.count, 3)
+        h = asyncio.run(run([1.23456789, [None, 0]]))
+        self.assertEqual(h.unf(), 'UNF:6:Do5dfAoOOFt4FSj0JcByEw==')
+        h = unf.UNFHasher(resumable=True)
+        with unittest.mock.patch('unf.ASYNC_SLICE_SIZE', 2):
+            asyncio.run(h.aupdate([1, 2, 3, 4, 5]))
+        self.assertEqual(h.unf(), unf.unf([1, 2, 3, 4, 5]))
+        self.assertEqual(h.count, 5)
+        with self.assertRaises(TypeError):
+            asyncio.run(h.aupdate([[1, 2]]))
+        return
+
+@unittest.skipIf(not numpy, 'numpy not installed')
+class TestSegments(unittest.TestCase):
+
+    def check(self, data, offsets, digits=unf.DEFAULT_DIGITS):
+        expected = [ unf.unf(data[start:end], digits) 
+                     for (start, end) in zip(offsets[:-1], offsets[1:]) ]
+        self.assertEqual(unf.unf_segments(data, offsets, digits), expected)
+        return
+
+    def test_numpy(self):
+        a = numpy.arange(100) / 7
+        self.check(a, [0, 3, 3, 50, 99, 100])
+        self.check(a, [10, 20])
+        self.check(a, [0])
+        self.check(a.astype(int), [0, 1, 10, 100], 2)
+        self.check(numpy.array(['a', 'b', 'c' * 200, '']), [0, 2, 4])
+        return
+
+    def test_batches(self):
+        a = numpy.arange(1000) / 7
+        offsets = [0, 1, 5, 300, 310, 320, 321, 900, 950, 1000]
+        with unittest.mock.patch('unf.NUMPY_BLOCK_SIZE', 16):
+            self.check(a, offsets)
+        return
+
+    def test_many_digits(self):
+        self.check(numpy.arange(10) / 7, [0, 4, 10], 20)
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_pandas(self):
+        s = pandas.Series([1.5, None, 3, 4, None] * 5)
+        self.check(s, [0, 2, 2, 17, 25])
+        s = pandas.Series(['a', None, 'b'] * 5, dtype='string')
+        self.check(s, [0, 4, 15])
+        return
+
+    @unittest.skipIf(not pyarrow, 'pyarrow not installed')
+    def test_arrow(self):
+        a = pyarrow.chunked_array([[1, None, 3], [4, 5]])
+        self.check(a, [0, 2, 5])
+        a = pyarrow.array(['a', None, 'bc', 'd'])[1:]
+        self.check(a, [0, 1, 3])
+        return
+
+    def test_bad_offsets(self):
+        a = numpy.arange(10)
+        for offsets in ([], [0, 5, 4], [-1, 5], [0, 11], [[0, 1]]):
+            with self.assertRaises(ValueError):
+                unf.unf_segments(a, offsets)
+        with self.assertRaises(TypeError):
+            unf.unf_segments([1, 2, 3], [0, 3])
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_groups(self):
+        df = pandas.DataFrame({
+            'g': [2, 1, 2, 1, None, 2], 
+            'x': [1.5, 2, 3, 4, 5, 6], 
+            'y': ['a', 'b', 'c', 'd', 'e', 'f'], 
+        })
+        u = unf.unf_groups(df.groupby('g'))
+        self.assertEqual(list(u.columns), ['x', 'y'])
+        self.assertEqual(list(u.index), [1, 2])
+        self.assertEqual(u.loc[1, 'x'], unf.unf([2, 4]))
+        self.assertEqual(u.loc[2, 'y'], unf.unf(['a', 'c', 'f']))
+        u = unf.unf_groups(df.groupby('g', dropna=False)['x'], 3)
+        self.assertEqual(list(u), [unf.unf([2, 4], 3), 
+                                   unf.unf([1.5, 3, 6], 3), 
+                                   unf.unf([5], 3)])
+        return
+
+    def test_groups_not_as_index(self):
+        # the UNFs are indexed by the keys, as for as_index=True
+        df = pandas.DataFrame({
+            'g': [2, 1, 2, 1, None, 2], 
+            'h': ['a', 'a', 'b', 'b', 'a', 'b'], 
+            'x': [1.5, 2, 3, 4, 5, 6], 
+        })
+        for by in ('g', ['g', 'h']):
+            for dropna in (True, False):
+                expected = unf.unf_groups(df.groupby(by, dropna=dropna))
+                u = unf.unf_groups(df.groupby(by, 
+                                              dropna=dropna, 
+                                              as_index=False))
+                pandas.testing.assert_frame_equal(u, expected)
+                expected = unf.unf_groups(df.groupby(by, 
+                                                     dropna=dropna)['x'])
+                u = unf.unf_groups(df.groupby(by, 
+                                              dropna=dropna, 
+                                              as_index=False)['x'])
+                pandas.testing.assert_series_equal(u, expected)
+        return
+
+@unittest.skipIf(not pyarrow, 'pyarrow not installed')
+class TestFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.table = pyarrow.table({
+            'a': [ None if i % 7 == 0 else i / 3 for i in range(1000) ], 
+            'b': list(range(1000)), 
+            'c': [ f'value {i}' for i in range(1000) ], 
+        })
+        return
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+        return
+
+    def path(self, name):
+        return os.path.join(self.tempdir.name, name)
+
+    def write_parquet(self, name):
+        import pyarrow.parquet
+        path = self.path(name)
+        pyarrow.parquet.write_table(self.table, path, row_group_size=300)
+        return path
+
+    def write_csv(self, name, delimiter=','):
+        import pyarrow.csv
+        path = self.path(name)
+        options = pyarrow.csv.WriteOptions(delimiter=delimiter)
+        pyarrow.csv.write_csv(self.table, path, options)
+        return path
+
+    def test_parquet(self):
+        path = self.write_parquet('data.parquet')
+        self.assertEqual(unf.unf_file(path), unf.unf(self.table))
+        return
+
+    def test_parquet_batches(self):
+        path = self.write_parquet('data.pq')
+        with unittest.mock.patch('unf.PARQUET_BATCH_SIZE', 64):
+            u = unf.unf_file(path)
+        self.assertEqual(u, unf.unf(self.table))
+        return
+
+    def test_columns(self):
+        path = self.write_parquet('data.parquet')
+        u = unf.unf_file(path, columns=['a', 'b'])
+        self.assertEqual(u, unf.unf(self.table.select(['a', 'b'])))
+        u = unf.unf_file(path, columns=['c'])
+        self.assertEqual(u, unf.unf(self.table['c']))
+        return
+
+    def test_digits(self):
+        path = self.write_parquet('data.parquet')
+        u = unf.unf_file(path, digits=4)
+        self.assertEqual(u, unf.unf(self.table, 4))
+        self.assertTrue(u.startswith('UNF:6:N4:'))
+        return
+
+    def test_csv(self):
+        path = self.write_csv('data.csv')
+        self.assertEqual(unf.unf_file(path), unf.unf(self.table))
+        return
+
+    def test_csv_blocks(self):
+        path = self.write_csv('data.csv')
+        with unittest.mock.patch('unf.CSV_BLOCK_SIZE', 1024):
+            u = unf.unf_file(path, columns=['a', 'c'])
+        self.assertEqual(u, unf.unf(self.table.select(['a', 'c'])))
+        return
+
+    def test_no_rows(self):
+        import pyarrow.parquet
+        table = self.table.slice(0, 0)
+        path = self.path('empty.parquet')
+        pyarrow.parquet.write_table(table, path)
+        self.assertEqual(unf.unf_file(path), unf.unf(table))
+        self.assertEqual(unf.unf_file(path, ['a', 'b']), 
+                         unf.unf(table.select(['a', 'b'])))
+        path = self.path('empty.csv')
+        with open(path, 'w') as f:
+            f.write('a,b\n')
+        self.assertEqual(unf.unf_file(path), 
+                         unf.unf(pyarrow.table({'a': [], 'b': []})))
+        return
+
+    def test_missing_column(self):
+        path = self.write_parquet('data.parquet')
+        with self.assertRaises(ValueError):
+            unf.unf_file(path, columns=['a', 'x'])
+        return
+
+    def test_csv_late_fraction(self):
+        # the integer column gets a fraction after the first block
+        path = self.path('data.csv')
+        values = list(range(1000)) + [1.5]
+        with open(path, 'w') as f:
+            f.write('a,b\n')
+            f.writelines(f'{v},x{v}\n' for v in values)
+        with unittest.mock.patch('unf.CSV_BLOCK_SIZE', 1024):
+            u = unf.unf_file(path, columns=['a'])
+        self.assertEqual(u, unf.unf(values))
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_csv_read_csv(self):
+        # a CSV file has the UNF of the data frame read_csv() reads
+        path = self.path('data.csv')
+        with open(path, 'w') as f:
+            f.write('s,n,d,e,t\n'
+                    'foo,1.5,2020-01-01,,2020-01-01 10:00:00\n'
+                    ',NA,2020-01-02,,2020-01-01 11:00:00\n'
+                    'NA,3,2020-01-03,NA,\n'
+                    'bar,,2020-01-04,,2020-01-01 12:00:00\n')
+        df = pandas.read_csv(path)
+        self.assertEqual(unf.unf_file(path, columns=['s']), unf.unf(df['s']))
+        self.assertEqual(unf.unf_file(path), unf.unf(df))
+        return
+
+    def test_csv_late_string(self):
+        # the column is empty in the first block
+        path = self.path('data.csv')
+        values = [None] * 1000 + ['x', None]
+        with open(path, 'w') as f:
+            f.write('a,b\n')
+            f.writelines(f'{i},{v or ""}\n' for (i, v) in enumerate(values))
+        with unittest.mock.patch('unf.CSV_BLOCK_SIZE', 1024):
+            u = unf.unf_file(path, columns=['b'])
+        self.assertEqual(u, unf.unf(values))
+        return
+
+    def test_column_types(self):
+        path = self.path('data.csv')
+        with open(path, 'w') as f:
+            f.write('a,b\n1,2\n3,4\n')
+        u = unf.unf_file(path, column_types={'a': pyarrow.string()})
+        self.assertEqual(u, unf.unf(pyarrow.table({'a': ['1', '3'], 
+                                                   'b': [2, 4]})))
+        cache = unf.UNFCache(self.path('cache.db'))
+        self.assertEqual(unf.unf_file(path, cache=cache), unf.unf_file(path))
+        self.assertEqual(unf.unf_file(path, 
+                                      cache=cache, 
+                                      column_types={'a': pyarrow.string()}), 
+                         u)
+        cache.close()
+        return
+
+    def test_tsv(self):
+        path = self.write_csv('data.tsv', '\t')
+        self.assertEqual(unf.unf_file(path), unf.unf(self.table))
+        return
+
+    def test_compressed(self):
+        path = self.write_csv('data.csv')
+        gz_path = self.path('data.CSV.gz')
+        with open(path, 'rb') as f:
+            with pyarrow.CompressedOutputStream(gz_path, 'gzip') as out:
+                out.write(f.read())
+        self.assertEqual(unf.unf_file(gz_path), unf.unf(self.table))
+        return
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            unf.unf_file(self.path('data.xlsx'))
+        return
+
+    def test_main(self):
+        path = self.write_parquet('data.parquet')
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            rv = unf.main(['--text', '-d', '4', '-c', 'a,b', path, path])
+        self.assertEqual(rv, 0)
+        u = unf.unf(self.table.select(['a', 'b']), 4)
+        self.assertEqual(out.getvalue(), f'{u}  {path}\n' * 2)
+        return
+
+    def main(self, args):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), \
+             contextlib.redirect_stderr(io.StringIO()):
+            rv = unf.main(args)
+        return (rv, [ json.loads(line) for line in out.getvalue().split('\n')
+                      if line ])
+
+    def test_main_directory(self):
+        os.mkdir(self.path('sub'))
+        self.write_parquet('sub/b.parquet')
+        self.write_csv('a.csv')
+        numpy.save(self.path('c.npy'), numpy.array([[1, 2], [3, 4]]))
+        with open(self.path('notes.txt'), 'w') as fo:
+            fo.write('not data\n')
+        (rv, results) = self.main([self.tempdir.name])
+        self.assertEqual(rv, 0)
+        paths = [ self.path(name) for name in ('a.csv', 'c.npy', 
+                                               'sub/b.parquet') ]
+        self.assertEqual([ r['path'] for r in results ], paths)
+        self.assertEqual(results[0]['unf'], unf.unf(self.table))
+        self.assertEqual(results[1]['unf'], unf.unf(numpy.array([[1, 2], 
+                                                                 [3, 4]])))
+        self.assertNotIn('columns', results[0])
+        return
+
+    def test_main_per_column(self):
+        path = self.write_parquet('data.parquet')
+        (rv, results) = self.main(['--per-column', '-d', '9', path])
+        self.assertEqual(rv, 0)
+        self.assertEqual(results[0]['unf'], unf.unf(self.table, 9))
+        columns = { name: unf.unf(self.table[name], 9) 
+                    for name in self.table.column_names }
+        self.assertEqual(results[0]['columns'], columns)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            unf.main(['--text', '--per-column', '-c', 'b', path])
+        u = unf.unf(self.table['b'])
+        self.assertEqual(out.getvalue(), f'{u}  {path}\n{u}  {path}:b\n')
+        return
+
+    def test_main_jobs(self):
+        paths = [ self.write_csv(f'data{i}.csv') for i in range(5) ]
+        paths.insert(2, self.path('missing.csv'))
+        (rv, results) = self.main(['-j', '2'] + paths)
+        self.assertEqual(rv, 1)
+        self.assertEqual([ r['path'] for r in results ], paths)
+        self.assertIn('error', results[2])
+        u = unf.unf(self.table)
+        self.assertEqual([ r.get('unf') for r in results ], 
+                         [u, u, None, u, u, u])
+        return
+
+    def test_main_errors(self):
+        path = self.write_csv('data.csv')
+        numpy.save(self.path('data.npy'), numpy.arange(3))
+        (rv, results) = self.main(['-c', 'a,x', path])
+        self.assertEqual(rv, 1)
+        self.assertIn('error', results[0])
+        (rv, results) = self.main(['-c', 'a', self.path('data.npy')])
+        self.assertEqual(rv, 1)
+        self.assertIn('error', results[0])
+        with contextlib.redirect_stderr(io.StringIO()):
+            with self.assertRaises(SystemExit):
+                unf.main(['-j', '0', path])
+        return
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache = unf.UNFCache(os.path.join(self.tempdir.name, 'db'))
+        return
+
+    def tearDown(self):
+        self.cache.close()
+        self.tempdir.cleanup()
+        return
+
+    def test_list(self):
+        val = [1.23456789, None, 0]
+        u = 'UNF:6:Do5dfAoOOFt4FSj0JcByEw=='
+        self.assertEqual(unf.unf(val, cache=self.cache), u)
+        with unittest.mock.patch('unf._iter_normalize') as m:
+            self.assertEqual(unf.unf(val, cache=self.cache), u)
+            self.assertFalse(m.called)
+        return
+
+    def test_digits(self):
+        val = [1.23456789]
+        self.assertEqual(unf.unf(val, cache=self.cache), unf.unf(val))
+        self.assertEqual(unf.unf(val, 3, cache=self.cache), unf.unf(val, 3))
+        return
+
+    def test_keys(self):
+        # equal but distinguishable values have different keys
+        vals = ([0.0], [-0.0], [0], [False], (0.0,), 0.0)
+        keys = set([ unf._content_key(val) for val in vals ])
+        self.assertEqual(len(keys), len(vals))
+        for val in vals:
+            self.assertEqual(unf.unf(val, cache=self.cache), unf.unf(val))
+        return
+
+    def test_persistent(self):
+        val = [1, 2, 3]
+        unf.unf(val, cache=self.cache)
+        self.cache.close()
+        self.cache = unf.UNFCache(self.cache.path)
+        found = self.cache.lookup([unf._content_key(val)], 7)
+        self.assertEqual(len(found), 1)
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_numpy(self):
+        a = numpy.arange(30).reshape((3, 10)) / 7
+        (u, u_0) = (unf.unf(a), unf.unf(a[0]))
+        self.assertEqual(unf.unf(a, cache=self.cache), u)
+        with unittest.mock.patch('unf._normalize_numpy') as m, \
+             unittest.mock.patch('unf._format_vector') as f:
+            self.assertEqual(unf.unf(a, cache=self.cache), u)
+            self.assertEqual(unf.unf(a[0], cache=self.cache), u_0)
+            self.assertFalse(m.called)
+            self.assertFalse(f.called)
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_numpy_slice(self):
+        a = numpy.arange(30) / 7
+        unf.unf(a, cache=self.cache)
+        self.assertEqual(unf.unf(a[::2], cache=self.cache), unf.unf(a[::2]))
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_data_frame(self):
+        df = pandas.DataFrame({
+            'a': [1.2345678, 2, 3], 
+            'b': pandas.array([4, None, 6], dtype='Int64'), 
+            'c': ['x', None, 'z'], 
+        })
+        self.assertEqual(unf.unf(df, cache=self.cache), unf.unf(df))
+        df.loc[1, 'a'] = 7
+        wrapped = unittest.mock.Mock(wraps=unf._short_vector_values)
+        with unittest.mock.patch('unf._short_vector_values', wrapped):
+            u = unf.unf(df, cache=self.cache)
+        self.assertEqual(wrapped.call_count, 1)
+        self.assertEqual(u, unf.unf(df))
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_data_frame_threads(self):
+        df = pandas.DataFrame({'a': [1.2345678, 2, 3], 'b': [4, 5, 6]})
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            u = unf.unf(df, executor=executor, cache=self.cache)
+        self.assertEqual(u, 'UNF:6:qs7MinjKNf+1+wy/RfVNvA==')
+        return
+
+    @unittest.skipIf(not pyarrow, 'pyarrow not installed')
+    def test_arrow(self):
+        t = pyarrow.table({'a': [1.2345678, None, 3], 'b': ['x', 'y', 'z']})
+        self.assertEqual(unf.unf(t, cache=self.cache), unf.unf(t))
+        t2 = pyarrow.table({'a': t['a'][1:], 'b': t['b'][1:]})
+        self.assertEqual(unf.unf(t2, cache=self.cache), unf.unf(t2))
+        d = pyarrow.array(['x', 'y', 'x']).dictionary_encode()
+        self.assertEqual(unf.unf(d, cache=self.cache), unf.unf(d))
+        return
+
+    @unittest.skipIf(not pyarrow, 'pyarrow not installed')
+    def test_file(self):
+        path = os.path.join(self.tempdir.name, 'data.csv')
+        with open(path, 'w') as f:
+            f.write('a,b\n1,4\n2,5\n3,6\n')
+        u = 'UNF:6:Np0sj111a+rrJBgl6wNF9w=='
+        self.assertEqual(unf.unf_file(path, cache=self.cache), u)
+        with unittest.mock.patch('unf._read_file') as m:
+            self.assertEqual(unf.unf_file(path, cache=self.cache), u)
+            u_a = unf.unf_file(path, ['a'], cache=self.cache)
+            self.assertFalse(m.called)
+        self.assertEqual(u_a, unf.unf([1, 2, 3]))
+        # a changed file is read again
+        with open(path, 'w') as f:
+            f.write('a,b\n1,4\n2,5\n3,7\n')
+        os.utime(path, ns=(0, 0))
+        u = unf.unf_file(path, cache=self.cache)
+        self.assertEqual(u, unf.unf_file(path))
+        self.assertNotEqual(u, 'UNF:6:Np0sj111a+rrJBgl6wNF9w==')
+        return
+
+class TestMany(unittest.TestCase):
+
+    def setUp(self):
+        self.objs = [
+            [1.23456789, None, 0], 
+            (1, 2, 3), 
+            [], 
+            [True, False, -0.0, math.nan, math.inf, -math.inf], 
+            1.23456789, 
+            None, 
+            'Hello World', 
+            ['a', None], 
+            [1, 'a'], 
+            [2**60 + 1], 
+            [1e-310, 5e-324, 1e300], 
+        ]
+        return
+
+    def test_many(self):
+        for digits in (1, 3, 7, 15, 20):
+            expected = [ unf.unf(obj, digits) for obj in self.objs ]
+            self.assertEqual(unf.unf_many(self.objs, digits), expected)
+        return
+
+    def test_empty(self):
+        self.assertEqual(unf.unf_many([]), [])
+        self.assertEqual(unf.unf_many(iter([[1]])), [unf.unf([1])])
+        return
+
+    def test_batches(self):
+        objs = [ [ None if i % 7 == 0 else i / 3 for i in range(n % 5) ] 
+                 for n in range(200) ]
+        objs[50] = ['not a number']
+        expected = [ unf.unf(obj) for obj in objs ]
+        with unittest.mock.patch('unf.NUMPY_BLOCK_SIZE', 16):
+            self.assertEqual(unf.unf_many(objs), expected)
+        return
+
+    def test_digits(self):
+        with self.assertRaises(ValueError):
+            unf.unf_many([[1]], 0)
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_numpy(self):
+        objs = [numpy.arange(5) / 7, 
+                numpy.array([], dtype=float), 
+                numpy.array([True, False]), 
+                numpy.array([1, 2], dtype='uint8'), 
+                numpy.array([[1, 2], [3, 4]]), 
+                numpy.array(['a', 'b']), 
+                [1, 2]]
+        expected = [ unf.unf(obj) for obj in objs ]
+        self.assertEqual(unf.unf_many(objs), expected)
+        return
+
+    def test_executor(self):
+        expected = [ unf.unf(obj) for obj in self.objs ]
+        with unittest.mock.patch('unf.MANY_CHUNK_SIZE', 3):
+            with concurrent.futures.ThreadPoolExecutor(2) as executor:
+                unfs = unf.unf_many(self.objs, executor=executor)
+        self.assertEqual(unfs, expected)
+        return
+
+class TestExecutor(unittest.TestCase):
+
+    def test_list(self):
+        # not a higher-level object, so the executor isn't used
+        executor = unittest.mock.Mock()
+        u = unf.unf([1.23456789, None, 0], executor=executor)
+        self.assertEqual(u, 'UNF:6:Do5dfAoOOFt4FSj0JcByEw==')
+        self.assertFalse(executor.map.called)
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_numpy_threads(self):
+        a = numpy.arange(200, dtype=float).reshape((20, 10)) / 7
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            u = unf.unf(a, executor=executor)
+        self.assertEqual(u, unf.unf(a))
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_numpy_processes(self):
+        a = numpy.array([[1.2345678, 2, 3], [4, 5, 6]])
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            u = unf.unf(a, 6, executor=executor)
+        self.assertEqual(u, unf.unf(a, 6))
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_data_frame_threads(self):
+        df = pandas.DataFrame({'a': [1.2345678, 2, 3], 'b': [4, 5, 6]})
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            u = unf.unf(df, executor=executor)
+        self.assertEqual(u, 'UNF:6:qs7MinjKNf+1+wy/RfVNvA==')
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_data_frame_processes(self):
+        df = pandas.DataFrame({'a': [1.2345678, 2, 3], 'b': [4, 5, 6]})
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            u = unf.unf(df, executor=executor)
+        self.assertEqual(u, 'UNF:6:qs7MinjKNf+1+wy/RfVNvA==')
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_data_frame_duplicate_names(self):
+        df = pandas.DataFrame([[1, 4], [2, 5], [3, 6]], columns=['a', 'a'])
+        u = unf.unf(pandas.DataFrame({'a': [1, 2, 3], 'b': [4, 5, 6]}))
+        self.assertEqual(unf.unf(df), u)
+        return
+
+class TestImports(unittest.TestCase):
+
+    def test_lazy(self):
+        code = 'import sys, unf; unf.unf([1.5, None]); ' \
+               'unf.UNFHasher().update(1); ' \
+               'print(*[ m for m in ("numpy", "pandas", "pyarrow") ' \
+               'if m in sys.modules ])'
+        output = subprocess.run([sys.executable, '-c', code], 
+                                capture_output=True, 
+                                text=True, 
+                                check=True).stdout
+        self.assertEqual(output, '\n')
+        return
+
+    def test_lazy_standard(self):
+        code = 'import sys, unf; unf.unf([1.5, None]); ' \
+               'print(*[ m for m in ("asyncio", "sqlite3", "tracemalloc", ' \
+               '"ctypes", "concurrent.futures", "argparse") ' \
+               'if m in sys.modules ])'
+        output = subprocess.run([sys.executable, '-c', code], 
+                                capture_output=True, 
+                                text=True, 
+                                check=True).stdout
+        self.assertEqual(output, '\n')
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_loaded(self):
+        with unittest.mock.patch('unf.numpy', None), \
+             unittest.mock.patch('unf._unloaded', {'numpy'}):
+            u = unf.unf(numpy.array([1, 2, 3]))
+            self.assertIs(unf.numpy, numpy)
+        self.assertEqual(u, 'UNF:6:AvELPR5QTaBbnq6S22Msow==')
+        return
+
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_loaded_hasher(self):
+        with unittest.mock.patch('unf.pandas', None), \
+             unittest.mock.patch('unf._unloaded', {'pandas'}):
+            h = unf.UNFHasher()
+            h.update(pandas.Series([1, 2]))
+            h.update(pandas.Series([3]))
+            self.assertIs(unf.pandas, pandas)
+        self.assertEqual(h.unf(), 'UNF:6:AvELPR5QTaBbnq6S22Msow==')
+        return
+
+    @unittest.skipIf(not numpy, 'numpy not installed')
+    def test_many(self):
+        with unittest.mock.patch('unf.numpy', None), \
+             unittest.mock.patch('unf._unloaded', {'numpy'}):
+            self.assertEqual(unf.unf_many([[1, 2, 3]]), 
+                             ['UNF:6:AvELPR5QTaBbnq6S22Msow=='])
+            self.assertIs(unf.numpy, numpy)
+        return
+
+    def test_not_installed(self):
+        with unittest.mock.patch('unf.pyarrow', None), \
+             unittest.mock.patch('unf._unloaded', {'pyarrow'}), \
+             unittest.mock.patch.dict('sys.modules', {'pyarrow': None}):
+            with self.assertRaises(ImportError):
+                unf.unf_file('data.parquet')
+            self.assertIsNone(unf.pyarrow)
+            self.assertEqual(unf._unloaded, set())
+        return
+
 class DocsTests(unittest.TestCase):
 
     # Test assertions and examples in the documentation.
@@ -871,6 +2948,13 @@ class DocsTests(unittest.TestCase):
         self.assertEqual(unf.unf(val), u)
         return
 
+    def test_hasher(self):
+        h = unf.UNFHasher()
+        h.update(1.23456789)
+        h.update([None, 0])
+        self.assertEqual(h.unf(), 'UNF:6:Do5dfAoOOFt4FSj0JcByEw==')
+        return
+
     @unittest.skipIf(not numpy, 'numpy not installed')
     def test_numpy(self):
         val = numpy.array([1, 2, 3])
@@ -933,6 +3017,36 @@ class DocsTests(unittest.TestCase):
         self.assertEqual(unf.unf(value), u)
         return
 
+    @unittest.skipIf(not pandas, 'pandas not installed')
+    def test_pandas_extension_missing(self):
+        s = pandas.Series([1.23456789, None, 0], dtype='Float64')
+        u = 'UNF:6:Do5dfAoOOFt4FSj0JcByEw=='
+        self.assertEqual(unf.unf(s), u)
+        return
+
+    @unittest.skipIf(not pyarrow, 'pyarrow not installed')
+    def test_arrow(self):
+        a = pyarrow.array([1.23456789, None, 0])
+        u = 'UNF:6:Do5dfAoOOFt4FSj0JcByEw=='
+        self.assertEqual(unf.unf(a), u)
+        return
+
+    def test_many(self):
+        u = unf.unf_many([[1.23456789, None, 0], [1, 2, 3]])
+        self.assertEqual(u, ['UNF:6:Do5dfAoOOFt4FSj0JcByEw==', 
+                             'UNF:6:AvELPR5QTaBbnq6S22Msow=='])
+        return
+
+    @unittest.skipIf(not pyarrow, 'pyarrow not installed')
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, 'data.csv')
+            with open(path, 'w') as f:
+                f.write('a,b\n1,4\n2,5\n3,6\n')
+            u = unf.unf_file(path)
+        self.assertEqual(u, 'UNF:6:Np0sj111a+rrJBgl6wNF9w==')
+        return
+
     @unittest.skipIf(not pandas, 'pandas not installed')
     def test_pandas_na_object(self):
         s = pandas.Series([1, pandas.NA])
@@ -1,63 +1,1493 @@
 # See file COPYING distributed with python-unf for copyright and license.
 
 import hashlib
+import functools
+import itertools
+import collections
+import contextlib
 import math
+import re
 import base64
+import os
+import glob
+import sys
+import struct
+import pickle
+import threading
+import time
+import warnings
+import importlib
 
-try:
-    import numpy
-except ImportError:
-    numpy = None
+# The standard modules used only by some functions (asyncio, sqlite3, 
+# tracemalloc, ctypes, concurrent.futures, argparse, and json) are 
+# imported in them, as importing asyncio alone takes longer than 
+# importing the rest of this module.
 
-try:
-    import pandas
-except ImportError:
-    pandas = None
+# The optional packages (NumPy, pandas, and pyarrow) are imported 
+# lazily, as importing pandas in particular is slow: an object from one 
+# of them can only exist once it has been imported, so each function 
+# that dispatches on type first binds those of them that have been 
+# imported (see _import_loaded()).  These are None until then.
+numpy = None
+pandas = None
+pyarrow = None
 
-__version__ = '0.11.0'
+__version__ = '0.12.0'
 
 UNF_VERSION = 6
 DEFAULT_DIGITS = 7
 STRING_CHARACTERS = 128
 HASH_BYTES = 16
 
+# NumPy arrays are normalized in blocks of this many elements to bound 
+# the memory used for temporary arrays.
+NUMPY_BLOCK_SIZE = 2**16
+
+# the largest power of 10 we scale by in a single step (10**308 is 
+# the largest power of 10 that is representable as a float)
+MAX_SCALE = 308
+
+# the decimal exponent of the smallest (subnormal) float
+MIN_EXPONENT = -324
+
+# NumPy normalization works on 64-bit integers, so it can't handle 
+# more than this many digits; past this we fall back to the (pure 
+# Python) primitive normalization.
+NUMPY_MAX_DIGITS = 18
+
+# Find the decimal exponents of numbers from their binary exponents 
+# (frexp()) and a table rather than with log10().  The results are the 
+# same; which is faster depends on the platform's log10().  (NumPy's 
+# is vectorized on many processors, and is then the faster.)
+FREXP_EXPONENTS = False
+
+# the SHA-256 implementation: a callable returning a new hash object 
+# with the interface of hashlib's.  Any implementation of standard 
+# SHA-256 gives the same UNFs.
+SHA256 = hashlib.sha256
+
+# Normalized objects are passed to the hash in chunks of at most this 
+# many bytes.
+HASH_CHUNK_BYTES = 2**20
+
+# the header of fast_check() fingerprints, which are not UNFs
+FAST_CHECK_HEADER = 'FASTCHECK:'
+
+# the number of normalized numbers kept by the (scalar) normalization 
+# cache
+NUMBER_CACHE_SIZE = 2**16
+
+# NumPy blocks of integers spanning at most 1/VALUE_TABLE_RATIO as 
+# many values as the block has are normalized by formatting each value 
+# in the range once
+VALUE_TABLE_RATIO = 16
+
+# unf_many() passes objects to an executor in chunks of this many
+MANY_CHUNK_SIZE = 2**12
+
+# aunf() and UNFHasher.aupdate() normalize vectors in the executor this 
+# many values at a time, returning to the event loop in between
+ASYNC_SLICE_SIZE = 2**20
+
+# the length (bytes) of the content hashes that identify vectors in a 
+# UNFCache
+CACHE_KEY_BYTES = 32
+
+# unf_file() reads Parquet files this many rows at a time and CSV 
+# files this many bytes at a time.  (The data types of CSV columns 
+# are inferred from the first block, with integers read as floats; see 
+# _open_csv().)
+PARQUET_BATCH_SIZE = 2**16
+CSV_BLOCK_SIZE = 2**24
+
+# the strings read as missing values in CSV files, which are those of 
+# pandas.read_csv(), so that a file has the UNF of the data frame 
+# read_csv() reads from it
+CSV_NULL_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', 
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 
+    'n/a', 'nan', 'null', 
+]
+
+# unf_mmap() reads memory-mapped arrays in windows of this many bytes 
+# (a multiple of the page size), or, for Fortran-ordered 2-D arrays, 
+# at least this many columns at a time
+MMAP_WINDOW_BYTES = 2**22
+MMAP_MIN_COLUMNS = 64
+
 # --- public functions --------------------------------------------------
 
-def unf(obj, digits=DEFAULT_DIGITS):
+def unf(obj, digits=DEFAULT_DIGITS, executor=None, cache=None):
     """Calculate the UNF of an object.
 
     The returned UNF is the full UNF with headers (UNF:6: and an optional 
     digits indicator).  Non-standard string truncations and hash 
     truncations are not supported.
+
+    If an executor (a concurrent.futures.Executor) is given, the 
+    vectors of a higher-level object (the rows of a 2-D NumPy array or 
+    the columns of a pandas data frame) are digested in parallel.
+
+    If a cache (a UNFCache) is given, the digest of each vector is 
+    looked up by the vector's content, and only vectors not found are 
+    normalized.
+    """
+    if _profile is not None:
+        return _profile._unf(obj, digits, executor, cache)
+    encoded_hash = _digest(obj, digits, executor, cache)
+    return _unf_string(encoded_hash, digits)
+
+def unf_detail(obj, digits=DEFAULT_DIGITS, executor=None, cache=None):
+    """Calculate the UNF of an object and the UNFs of its vectors.
+
+    Returns the UNF and a dictionary mapping the name of each vector 
+    (column name, or row index of a 2-D NumPy array) to its UNF.  The 
+    vector UNFs are those digested for the UNF of the object, so this 
+    costs no more than unf(), which takes the same arguments.  An 
+    object that is a single vector is named None.  The dictionary can 
+    be passed to verify() to find which vector of the object changed.
+    """
+    _check_digits(digits)
+    vectors = _vectors(obj)
+    if vectors is None:
+        vectors = [(None, obj)]
+    with _recording(digits):
+        digests = _digest_vectors(vectors, digits, executor, cache)
+    unfs = { name: _unf_string(digest, digits) 
+             for ((name, vector), digest) in zip(vectors, digests) }
+    return (_digests_unf(digests, digits), unfs)
+
+async def aunf(obj, digits=DEFAULT_DIGITS, executor=None):
+    """Calculate the UNF of an object without blocking the event loop.
+
+    A coroutine returning unf(obj, digits).  Vectors are normalized in 
+    the executor (a concurrent.futures.Executor, or None for the event 
+    loop's default executor) in slices of ASYNC_SLICE_SIZE values and 
+    hashed as the slices arrive; the vectors of a higher-level object 
+    are digested concurrently, as many at a time as the executor has 
+    workers, so that no more normalized slices than that are held at 
+    once.
     """
-    encoded_hash = _digest(obj, digits)
+    import asyncio
+    _check_digits(digits)
+    vectors = _vectors(obj)
+    if vectors is None:
+        vectors = [(None, obj)]
+    # Each vector being digested holds one normalized slice at most, so 
+    # there are as many vectors digested at once as the executor has 
+    # workers, and no more slices wait to be hashed.
+    semaphore = asyncio.Semaphore(_executor_workers(executor))
+    digests = await asyncio.gather(*[ _adigest(vector, 
+                                               digits, 
+                                               executor, 
+                                               semaphore) 
+                                      for (name, vector) in vectors ])
+    return _digests_unf(digests, digits)
+
+def unf_many(objs, digits=DEFAULT_DIGITS, executor=None):
+    """Calculate the UNFs of many objects.
+
+    Returns a list of the UNFs of the objects, in order.  Numeric 
+    vectors (lists and tuples of numbers and None, 1-D numeric NumPy 
+    arrays, and numbers) are normalized together, many at a time, and 
+    the normalized form of each is then hashed separately; other 
+    objects are passed to unf().  This is much faster than calling 
+    unf() for each of many short vectors.
+
+    If an executor (a concurrent.futures.Executor) is given, the 
+    objects are passed to it in chunks of MANY_CHUNK_SIZE.
+    """
+    _check_digits(digits)
+    objs = list(objs)
+    if executor is None:
+        return _unf_batch(objs, digits)
+    chunks = [ objs[i:i+MANY_CHUNK_SIZE] 
+               for i in range(0, len(objs), MANY_CHUNK_SIZE) ]
+    unfs = []
+    for chunk_unfs in executor.map(_unf_batch, 
+                                   chunks, 
+                                   [digits] * len(chunks)):
+        unfs.extend(chunk_unfs)
+    return unfs
+
+def unf_segments(data, offsets, digits=DEFAULT_DIGITS):
+    """Calculate the UNF of each segment of a vector.
+
+    data is a NumPy array, pandas series, or Arrow array, and segment i 
+    is data[offsets[i]:offsets[i+1]] (so there is one segment fewer 
+    than there are offsets).  Returns a list of the UNFs of the 
+    segments.  The values are formatted a block at a time, each block 
+    holding many segments, and the normalized form of each segment is 
+    then hashed separately, so this is much faster than calling unf() 
+    for each segment.
+    """
+    _check_digits(digits)
+    (values, missing) = _vector_values(data)
+    offsets = numpy.asarray(offsets, dtype='int64')
+    if offsets.ndim != 1 or offsets.shape[0] == 0:
+        raise ValueError('offsets must be a 1-D array of at least one offset')
+    if (numpy.diff(offsets) < 0).any() \
+            or offsets[0] < 0 or offsets[-1] > values.shape[0]:
+        raise ValueError('offsets must be increasing and within the data')
+    return _segment_unfs(values, missing, offsets, digits)
+
+def unf_groups(grouped, digits=DEFAULT_DIGITS):
+    """Calculate the UNF of each group of a pandas groupby.
+
+    For a grouped series, returns a series of UNFs indexed by the group 
+    keys; for a grouped data frame, returns a data frame of UNFs with a 
+    row for each group and a column for each (non-key) column.  Values 
+    whose group key is missing are dropped (if the groupby drops them).
+    The UNFs are indexed by the group keys even for a groupby with 
+    as_index=False.  The groups are fingerprinted as segments (see 
+    unf_segments()).
+    """
+    _import_loaded()
+    _check_digits(digits)
+    # values in no group (with a missing key) have a missing code
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype='int64')
+    sizes = grouped.size()
+    if isinstance(sizes, pandas.DataFrame):
+        # With as_index=False, the keys are the columns of size() 
+        # before the sizes rather than its index.
+        sizes = sizes.set_index(list(sizes.columns[:-1]))
+    keys = sizes.index
+    order = numpy.argsort(codes, kind='stable')
+    order = order[codes[order] >= 0]
+    counts = numpy.bincount(codes[order], minlength=len(keys))
+    offsets = numpy.concatenate([[0], numpy.cumsum(counts)])
+    if isinstance(grouped.obj, pandas.Series):
+        series = grouped.obj.iloc[order]
+        return pandas.Series(unf_segments(series, offsets, digits), 
+                             index=keys, 
+                             dtype=object)
+    frame = grouped.obj.iloc[order]
+    # key columns are not fingerprinted
+    exclusions = getattr(grouped, 'exclusions', set())
+    unfs = { name: unf_segments(frame.iloc[:,i], offsets, digits) 
+             for (i, name) in enumerate(frame.columns) 
+             if name not in exclusions }
+    return pandas.DataFrame(unfs, index=keys, dtype=object)
+
+def unf_file(path, columns=None, digits=DEFAULT_DIGITS, cache=None, 
+             column_types=None):
+    """Calculate the UNF of a data file.
+
+    The file (Parquet, CSV, or TSV, by extension) is read in blocks 
+    and each column is hashed as it is read, so the file is never 
+    loaded as a whole.  columns, if given, selects the columns to 
+    include.  The UNF is that of the table of the selected columns.
+
+    CSV and TSV files are read as pandas.read_csv() reads them, so 
+    that a file has the UNF of the data frame read from it: the 
+    strings of CSV_NULL_VALUES (such as empty fields and NA) are 
+    missing values, and dates are strings.  The types of columns are 
+    inferred from the first block of the file (see CSV_BLOCK_SIZE), 
+    except that integer columns are read as floats (which have the 
+    same UNFs), so that a fraction later in the file can be read, and 
+    columns with only missing values there are read as strings.  
+    column_types, a dictionary mapping column names to Arrow data 
+    types, sets the types of columns of such files explicitly.
+
+    If a cache (a UNFCache) is given, the digest of each column is 
+    looked up by the file's path, size, and modification time, and 
+    only columns not found are read.
+
+    pyarrow is required.
+    """
+    digests = _file_digests(path, columns, digits, cache, column_types)
+    return _digests_unf(list(digests.values()), digits)
+
+def unf_mmap(path, digits=DEFAULT_DIGITS, dtype=None, shape=None, 
+             order='C', offset=0):
+    """Calculate the UNF of a memory-mapped 1- or 2-D array.
+
+    With no dtype, path is a .npy file; otherwise it is a raw binary 
+    file of the given dtype (e.g. '<f8'), shape, order, and header 
+    offset, as for numpy.memmap.  The array is read and hashed in 
+    windows of MMAP_WINDOW_BYTES, leaving the buffering to the 
+    operating system's page cache, so the array is never loaded as a 
+    whole.  As for unf(), each row of a 2-D array is a vector.  Rows 
+    of at most NUMPY_BLOCK_SIZE values are read a window of rows at a 
+    time and digested together; longer rows of Fortran-ordered arrays 
+    are read by columns, so no contiguous copy of a row is made.
+    """
+    digests = _mmap_digests(path, digits, dtype, shape, order, offset)
+    return _digests_unf(digests, digits)
+
+def unf_resume(obj, state=None, digits=DEFAULT_DIGITS):
+    """Calculate the UNF of an object that is appended to over time.
+
+    Returns the UNF and a state from which the calculation can be 
+    resumed: given the state and only the values appended since, 
+    unf_resume() returns the UNF of the whole object (and a new state).  
+    For a data frame, table, or 2-D NumPy array, each vector (column, 
+    or row of the array) is extended by the corresponding vector of 
+    obj, and the vectors must be the same as those in the state.
+
+    The state is a list of [name, state] pairs, one for each vector 
+    (see UNFHasher.state()), and may be saved as JSON.
+    """
+    vectors = _vectors(obj)
+    if vectors is None:
+        vectors = [(None, obj)]
+    if state is None:
+        hashers = [ UNFHasher(digits, resumable=True) for v in vectors ]
+    else:
+        states = { name: vector_state for (name, vector_state) in state }
+        if sorted(map(repr, states)) \
+                != sorted([ repr(name) for (name, vector) in vectors ]):
+            raise ValueError('the vectors do not match those of the state')
+        hashers = [ UNFHasher.from_state(states[name]) 
+                    for (name, vector) in vectors ]
+        if any(hasher.digits != digits for hasher in hashers):
+            raise ValueError('digits does not match that of the state')
+    for (hasher, (name, vector)) in zip(hashers, vectors):
+        hasher.update(vector)
+    digests = [ hasher._encoded_digest() for hasher in hashers ]
+    state = [ [name, hasher.state()] 
+              for (hasher, (name, vector)) in zip(hashers, vectors) ]
+    return (_digests_unf(digests, digits), state)
+
+def fast_check(obj):
+    """Calculate a fast check fingerprint of an object.
+
+    This is not a UNF, and starts with FAST_CHECK_HEADER rather than a 
+    UNF header.  The raw values of each vector (with their data type 
+    and missing values) are hashed with SHA256, as they are to identify 
+    vectors in a UNFCache, without being normalized.  This is much 
+    faster than unf(), but the fingerprint depends on the data types 
+    and on every bit of the values, and is only good for telling 
+    whether the same data has changed.  As for unf(), the vectors of a 
+    higher-level object are digested separately, and the digests 
+    sorted and digested.  Vectors whose values can't be read raw are 
+    normalized (to NUMPY_MAX_DIGITS digits).
+    """
+    vectors = _vectors(obj)
+    if vectors is None:
+        vectors = [(None, obj)]
+    digests = []
+    for (name, vector) in vectors:
+        hash = _content_hash(vector, SHA256())
+        if hash is None:
+            pieces = _iter_normalize(vector, NUMPY_MAX_DIGITS)
+            hash = _hash_pieces(SHA256(), pieces)
+        digests.append(hash.digest())
+    if len(digests) == 1:
+        digest = digests[0]
+    else:
+        digest = SHA256(b''.join(sorted(digests))).digest()
+    encoded_hash = base64.b64encode(digest[:HASH_BYTES]).decode()
+    return FAST_CHECK_HEADER + encoded_hash
+
+def verify(obj, expected_unf, per_column_expected=None):
+    """Check that an object has a UNF.
+
+    The digits are those of expected_unf (from its header), so it can 
+    be checked as recorded (e.g. in Dataverse).  Returns a (matches, 
+    name) pair: name is None, or the name of the vector that did not 
+    match if per_column_expected is given.
+
+    per_column_expected maps vector names (column names, or row 
+    indexes of an array) to their expected UNFs, as returned by 
+    unf_detail(); an object that is a single vector is named None.  
+    The vectors are then checked one at a time, and verification stops 
+    at the first that does not match (or is missing), without 
+    digesting the rest.  Vectors with no expected UNF are only checked 
+    through expected_unf.
+    """
+    (digits, encoded_hash) = _parse_unf(expected_unf)
+    with _recording(digits):
+        return _verify(obj, digits, encoded_hash, per_column_expected)
+
+class UNFHasher:
+
+    """Incrementally calculate the UNF of a vector.
+
+    The interface follows that of the hashlib hash objects: the vector 
+    is passed to update() in chunks (primitives, tuples and lists of 
+    primitives, 1-D NumPy arrays, pandas series, or Arrow arrays), and 
+    the normalized values are hashed as they arrive, so the whole 
+    vector need never be held in memory.  The UNF of the concatenated 
+    chunks is then available from unf().
+
+    digest() and hexdigest() give the truncated (HASH_BYTES) hash that 
+    the UNF encodes.  count is the number of values passed so far.
+
+    A resumable hasher can save its state (state()), from which a new 
+    hasher can continue (from_state()), in another process or later.  
+    hashlib hashes can't be saved, so resumable hashers use _SHA256.
+    """
+
+    def __init__(self, digits=DEFAULT_DIGITS, resumable=False):
+        _check_digits(digits)
+        self.digits = digits
+        self.count = 0
+        if resumable:
+            self._hash = _SHA256()
+        else:
+            self._hash = SHA256()
+        return
+
+    @classmethod
+    def from_state(cls, state):
+        """Return a resumable hasher continuing from a saved state."""
+        try:
+            (version, digits, count, midstate) = state.split(':')
+            if int(version) != UNF_VERSION:
+                raise ValueError(f'state is for UNF version {version}')
+            midstate = base64.b64decode(midstate, validate=True)
+            hasher = cls(int(digits), resumable=True)
+            hasher.count = int(count)
+            hasher._hash = _SHA256(midstate)
+        except (AttributeError, TypeError, ValueError) as e:
+            raise ValueError(f'bad hasher state: {e}') from None
+        return hasher
+
+    def state(self):
+        """Return the state of a resumable hasher, as a string."""
+        if not isinstance(self._hash, _SHA256):
+            raise TypeError('the hasher is not resumable')
+        midstate = base64.b64encode(self._hash.state()).decode()
+        return f'{UNF_VERSION}:{self.digits}:{self.count}:{midstate}'
+
+    def update(self, data):
+        """Add a chunk of the vector."""
+        _check_chunk(data)
+        _hash_pieces(self._hash, _iter_normalize(data, self.digits))
+        self.count += _count(data)
+        return
+
+    async def aupdate(self, data, executor=None):
+        """Add a chunk of the vector without blocking the event loop.
+
+        The chunk is normalized in the executor (a 
+        concurrent.futures.Executor, or None for the event loop's 
+        default executor) in slices of ASYNC_SLICE_SIZE values, and 
+        each slice is hashed in the event loop's default executor (a 
+        thread, as the hash can't be passed to another process; hashlib 
+        releases the GIL).  Chunks are added in the order in which 
+        aupdate() is awaited, so calls on one hasher must not overlap.
+        """
+        import asyncio
+        _check_chunk(data)
+        loop = asyncio.get_running_loop()
+        for piece in _slices(data, ASYNC_SLICE_SIZE):
+            string = await loop.run_in_executor(executor, 
+                                                _normalize, 
+                                                piece, 
+                                                self.digits)
+            await loop.run_in_executor(None, self._hash.update, string)
+            self.count += _count(piece)
+        return
+
+    async def aupdate_from(self, chunks, executor=None):
+        """Add the chunks of an (async or ordinary) iterable in turn."""
+        if hasattr(chunks, '__aiter__'):
+            async for data in chunks:
+                await self.aupdate(data, executor)
+        else:
+            for data in chunks:
+                await self.aupdate(data, executor)
+        return
+
+    def copy(self):
+        """Return a copy of the hasher."""
+        other = self.__class__.__new__(self.__class__)
+        other.digits = self.digits
+        other.count = self.count
+        other._hash = self._hash.copy()
+        return other
+
+    def digest(self):
+        """Return the (truncated) hash of the data passed so far."""
+        return self._hash.digest()[:HASH_BYTES]
+
+    def hexdigest(self):
+        """Return the (truncated) hash as a string of hex digits."""
+        return self.digest().hex()
+
+    def unf(self):
+        """Return the UNF of the data passed so far."""
+        return _unf_string(self._encoded_digest(), self.digits)
+
+    def _encoded_digest(self):
+        """Return the digest as _digest() does."""
+        return base64.b64encode(self.digest()).decode()
+
+class UNFCache:
+
+    """A persistent cache of vector digests.
+
+    The digests are kept in an SQLite database at path (which may be 
+    ':memory:'), keyed by the identity of the vector and by digits and 
+    UNF_VERSION.  unf() identifies vectors by a hash of their contents 
+    (see CACHE_KEY_BYTES) and unf_file() by the path, size, and 
+    modification time of the file and the column name.  The cache is 
+    only used from the calling thread.
+    """
+
+    def __init__(self, path):
+        import sqlite3
+        self.path = path
+        self._db = sqlite3.connect(path)
+        with self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS digests (
+                                    key TEXT NOT NULL, 
+                                    digits INTEGER NOT NULL, 
+                                    version INTEGER NOT NULL, 
+                                    digest TEXT NOT NULL, 
+                                    PRIMARY KEY (key, digits, version)
+                                )""")
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+        return
+
+    def lookup(self, keys, digits):
+        """Return a dictionary of the digests found for keys."""
+        found = {}
+        for key in keys:
+            row = self._db.execute("""SELECT digest FROM digests 
+                                      WHERE key = ? 
+                                      AND digits = ? 
+                                      AND version = ?""", 
+                                   (key, digits, UNF_VERSION)).fetchone()
+            if row is not None:
+                found[key] = row[0]
+        return found
+
+    def store(self, entries, digits):
+        """Store a dictionary of digests by key."""
+        with self._db:
+            self._db.executemany("""INSERT OR REPLACE INTO digests 
+                                    VALUES (?, ?, ?, ?)""", 
+                                 [ (key, digits, UNF_VERSION, digest) 
+                                   for (key, digest) in entries.items() ])
+        return
+
+class UNFProfile:
+
+    """Record where the time of unf() calls goes.
+
+    While the profile is active (as a context manager), each top-level 
+    unf(), unf_detail(), or verify() call is recorded as a dictionary 
+    in calls, holding digits, 
+    the wall time (seconds), the number of values (elements) and of 
+    normalized bytes hashed (bytes), and stages, the time spent in 
+    each stage of the calculation: normalizing each kind of vector 
+    ('numpy', 'pandas', 'arrow', 'list', or 'primitive'), combining 
+    the digests of a higher-level object ('collection'), and hashing 
+    ('hash').  Time in the vectors of a higher-level object is counted 
+    in their own stages only.  Vectors digested in other processes (by 
+    a process pool executor) are not recorded.
+
+    If memory is true, peak_memory is the peak memory allocated (as 
+    traced by tracemalloc, which NumPy reports to) during the call, 
+    beyond that allocated before it; tracing slows the calculation 
+    considerably.  If a logger (a logging.Logger) is given, each call 
+    is also logged to it at level INFO, with the dictionary as the 
+    unf_profile attribute of the log record.
+
+    Calls are recorded one at a time; unf() calls made in other 
+    threads while a call is recorded are counted in it.  The other 
+    functions (unf_file(), unf_mmap(), unf_resume(), aunf(), and 
+    UNFHasher) are not profiled, and unf_many() records only the 
+    objects it passes to unf() (not its batches of numeric vectors).
+    """
+
+    def __init__(self, memory=False, logger=None):
+        self.memory = memory
+        self.logger = logger
+        self.calls = []
+        self._call = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._previous = None
+        return
+
+    def __enter__(self):
+        global _profile
+        self._previous = _profile
+        _profile = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _profile
+        _profile = self._previous
+        return
+
+    def totals(self):
+        """Return the totals over all calls, as a call dictionary."""
+        totals = {
+            'calls': len(self.calls), 
+            'seconds': 0.0, 
+            'elements': 0, 
+            'bytes': 0, 
+            'stages': {}, 
+        }
+        for call in self.calls:
+            for key in ('seconds', 'elements', 'bytes'):
+                totals[key] += call[key]
+            for (stage, seconds) in call['stages'].items():
+                totals['stages'][stage] = \
+                    totals['stages'].get(stage, 0.0) + seconds
+        return totals
+
+    def _unf(self, obj, digits, executor, cache):
+        """Calculate and record a UNF, as unf() does."""
+        with self._recording(digits):
+            encoded_hash = _digest(obj, digits, executor, cache)
+        return _unf_string(encoded_hash, digits)
+
+    @contextlib.contextmanager
+    def _recording(self, digits):
+        """Record the calculation in the context as a call."""
+        if self._call is not None:
+            # nested in a recorded call (for the digests of a 
+            # higher-level object)
+            yield
+            return
+        call = {
+            'digits': digits, 
+            'seconds': 0.0, 
+            'elements': 0, 
+            'bytes': 0, 
+            'stages': {}, 
+            'peak_memory': None, 
+        }
+        if self.memory:
+            import tracemalloc
+        tracing = self.memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if self.memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        self._call = call
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            call['seconds'] = time.perf_counter() - start
+            self._call = None
+            if self.memory:
+                call['peak_memory'] = tracemalloc.get_traced_memory()[1] - \
+                                      base
+            if tracing:
+                tracemalloc.stop()
+        self.calls.append(call)
+        if self.logger is not None:
+            self.logger.info('unf: %.6f s, %d elements, %d bytes', 
+                             call['seconds'], 
+                             call['elements'], 
+                             call['bytes'], 
+                             extra={'unf_profile': call})
+        return
+
+    def _add(self, stage=None, seconds=0.0, elements=0, n_bytes=0):
+        """Add to the record of the current call."""
+        with self._lock:
+            call = self._call
+            if call is None:
+                return
+            if stage is not None:
+                stages = call['stages']
+                stages[stage] = stages.get(stage, 0.0) + seconds
+            call['elements'] += elements
+            call['bytes'] += n_bytes
+        return
+
+    @contextlib.contextmanager
+    def _timing(self, stage, n_bytes=0):
+        """Add the time taken in the context to a stage.
+
+        Time in stages timed within (on the same thread) is not added.
+        """
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        stack = self._local.stack
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            inner = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self._add(stage, elapsed - inner, n_bytes=n_bytes)
+        return
+
+    def _timed(self, pieces, stage):
+        """Generate pieces, adding the time taken to produce them."""
+        pieces = iter(pieces)
+        while True:
+            with self._timing(stage):
+                piece = next(pieces, None)
+            if piece is None:
+                return
+            yield piece
+
+# the active UNFProfile, if any
+_profile = None
+
+def _recording(digits):
+    """Return a context recording a call in the active profile, if any."""
+    if _profile is None:
+        return contextlib.nullcontext()
+    return _profile._recording(digits)
+
+# --- utilities ---------------------------------------------------------
+
+# the optional packages that are not yet bound (and may be installed)
+_unloaded = {'numpy', 'pandas', 'pyarrow'}
+
+def _import(name):
+    """Import an optional package, if it is installed.
+
+    The package is bound to its module global, which is returned (None 
+    if the package is not installed).
+    """
+    if name in _unloaded:
+        try:
+            globals()[name] = importlib.import_module(name)
+        except ImportError:
+            pass
+        _unloaded.discard(name)
+    return globals()[name]
+
+def _import_loaded():
+    """Bind the optional packages that have been imported elsewhere."""
+    if _unloaded:
+        # (a copy, as _import() changes _unloaded)
+        for name in list(_unloaded):
+            if name in sys.modules:
+                _import(name)
+    return
+
+def _unf_string(encoded_hash, digits):
+    """Build the full UNF (with headers) from an encoded hash."""
     if digits == DEFAULT_DIGITS:
         rv = f'UNF:{UNF_VERSION}:{encoded_hash}'
     else:
         rv = f'UNF:{UNF_VERSION}:N{digits}:{encoded_hash}'
     return rv
 
-# --- utilities ---------------------------------------------------------
+def _parse_unf(u):
+    """Return the digits and encoded hash of a UNF."""
+    match = re.fullmatch(r'UNF:(\d+):(?:N(\d+):)?([A-Za-z0-9+/]+=*)', u)
+    if not match:
+        raise ValueError(f'bad UNF {u!r}')
+    (version, digits, encoded_hash) = match.groups()
+    if int(version) != UNF_VERSION:
+        raise ValueError(f'UNF version {version} is not supported')
+    if digits is None:
+        return (DEFAULT_DIGITS, encoded_hash)
+    digits = int(digits)
+    _check_digits(digits)
+    return (digits, encoded_hash)
 
-def _digest(obj, digits):
-    """Calculate the digest of an object."""
-    string = _normalize(obj, digits)
-    hash = hashlib.sha256(string).digest()
-    return base64.b64encode(hash[:HASH_BYTES]).decode()
+def _verify(obj, digits, encoded_hash, per_column_expected=None):
+    """Check an object against the encoded hash of a UNF (see verify())."""
+    vectors = _vectors(obj)
+    if vectors is None:
+        vectors = [(None, obj)]
+    if per_column_expected is None:
+        digests = [ _digest(vector, digits) for (name, vector) in vectors ]
+    else:
+        expected = {}
+        for (name, column_unf) in per_column_expected.items():
+            (column_digits, expected[name]) = _parse_unf(column_unf)
+            if column_digits != digits:
+                msg = f'digits of the UNF of {name!r} do not match'
+                raise ValueError(msg)
+        names = { name for (name, vector) in vectors }
+        for name in expected:
+            if name not in names:
+                return (False, name)
+        digests = []
+        for (name, vector) in vectors:
+            digest = _digest(vector, digits)
+            if name in expected and digest != expected[name]:
+                return (False, name)
+            digests.append(digest)
+    matches = _digests_unf(digests, digits) \
+              == _unf_string(encoded_hash, digits)
+    return (matches, None)
 
-def _normalize(data, digits):
-    """Normalize an object to a byte string."""
+def _digests_unf(digests, digits):
+    """Return the UNF of a collection of vectors from their digests.
+
+    As for _iter_normalize(), a single vector has its own UNF.  (This 
+    doesn't go through unf(), so it isn't recorded as a call of its own 
+    by a UNFProfile.)
+    """
+    if len(digests) == 1:
+        return _unf_string(digests[0], digits)
+    hash = SHA256(_normalize(sorted(digests), digits))
+    encoded_hash = base64.b64encode(hash.digest()[:HASH_BYTES]).decode()
+    return _unf_string(encoded_hash, digits)
+
+def _unf_batch(objs, digits):
+    """Calculate the UNFs of a list of objects (see unf_many())."""
+    if not _import('numpy') or digits > NUMPY_MAX_DIGITS:
+        return [ unf(obj, digits) for obj in objs ]
+    unfs = numpy.empty(len(objs), dtype=object)
+    types = list(map(type, objs))
+    lists = [ i for (i, t) in enumerate(types) if t is list or t is tuple ]
+    _unf_numeric_vectors(lists, [ objs[i] for i in lists ], digits, unfs)
+    numbers = [ i for (i, t) in enumerate(types) if t in _NUMBER_TYPES ]
+    _unf_numeric_vectors(numbers, [ [objs[i]] for i in numbers ], digits, unfs)
+    arrays = [ i for (i, t) in enumerate(types) 
+               if t is numpy.ndarray 
+               and objs[i].ndim == 1 
+               and objs[i].dtype.kind in ['i', 'u', 'f', 'b'] ]
+    _unf_numeric_vectors(arrays, [ objs[i] for i in arrays ], digits, unfs)
+    for i in numpy.flatnonzero(numpy.equal(unfs, None)).tolist():
+        unfs[i] = unf(objs[i], digits)
+    return unfs.tolist()
+
+_NUMBER_TYPES = (float, int, bool, type(None))
+
+def _unf_numeric_vectors(indexes, vectors, digits, unfs):
+    """Set the UNFs of numeric vectors in unfs (a NumPy object array).
+
+    The vectors (all lists and tuples or all arrays) are passed to 
+    _unf_numeric_batch() in batches of about NUMPY_BLOCK_SIZE values.
+    """
+    lengths = numpy.fromiter(map(len, vectors), 
+                             dtype='int64', 
+                             count=len(vectors))
+    batch = (numpy.cumsum(lengths) - lengths) // NUMPY_BLOCK_SIZE
+    bounds = [0] + (numpy.flatnonzero(numpy.diff(batch)) + 1).tolist()
+    bounds.append(len(vectors))
+    for (start, end) in zip(bounds[:-1], bounds[1:]):
+        if start < end:
+            _unf_numeric_batch(indexes[start:end], 
+                               vectors[start:end], 
+                               lengths[start:end], 
+                               digits, 
+                               unfs)
+    return
+
+def _unf_numeric_batch(indexes, vectors, lengths, digits, unfs):
+    """Set the UNFs of a batch of numeric vectors in unfs.
+
+    The values are formatted together and the normalized form of each 
+    vector hashed separately.  Lists that turn out not to be numeric 
+    (see _numeric_list()) are left alone.
+    """
+    if isinstance(vectors[0], numpy.ndarray):
+        values = numpy.concatenate(vectors).astype(float)
+        missing = None
+    else:
+        flat = list(itertools.chain.from_iterable(vectors))
+        values = _numeric_list(flat)
+        if values is None:
+            # Some vectors aren't numeric, so we split the batch to 
+            # find them.
+            if len(vectors) > 1:
+                mid = len(vectors) // 2
+                _unf_numeric_batch(indexes[:mid], vectors[:mid], 
+                                   lengths[:mid], digits, unfs)
+                _unf_numeric_batch(indexes[mid:], vectors[mid:], 
+                                   lengths[mid:], digits, unfs)
+            return
+        # None is nan in values
+        missing = numpy.isnan(values)
+        nans = numpy.flatnonzero(missing)
+        missing[nans] = [ flat[i] is None for i in nans.tolist() ]
+    (buf, ends) = _format_numpy(values, digits, missing)
+    bounds = numpy.concatenate([[0], numpy.cumsum(lengths)])
+    unfs[indexes] = _hash_segments(buf, ends, bounds, digits)
+    return
+
+def _unf_strings(digests, digits):
+    """Return the UNFs of concatenated (untruncated) SHA-256 digests.
+
+    The digests are truncated, encoded, and given headers all at once: 
+    truncated digests padded to a multiple of three bytes are encoded 
+    together, and the encoding of each then ends in the padding 
+    characters.
+    """
+    digests = numpy.frombuffer(digests, dtype='uint8').reshape((-1, 32))
+    n_padded = -(-HASH_BYTES // 3) * 3
+    padded = numpy.zeros((digests.shape[0], n_padded), dtype='uint8')
+    padded[:,:HASH_BYTES] = digests[:,:HASH_BYTES]
+    encoded = numpy.frombuffer(base64.b64encode(padded.tobytes()), 
+                               dtype='uint8')
+    encoded = encoded.reshape((digests.shape[0], -1))
+    prefix = _unf_string('', digits).encode()
+    unfs = numpy.empty((digests.shape[0], len(prefix)+encoded.shape[1]), 
+                       dtype='uint8')
+    unfs[:,:len(prefix)] = numpy.frombuffer(prefix, dtype='uint8')
+    unfs[:,len(prefix):] = encoded
+    if n_padded > HASH_BYTES:
+        unfs[:,HASH_BYTES-n_padded:] = ord('=')
+    unfs = unfs.view(f'S{unfs.shape[1]}').ravel()
+    return unfs.astype(f'U{unfs.itemsize}').tolist()
+
+def _numeric_list(values):
+    """Convert a list of numbers and None to a NumPy array of floats.
+
+    Returns None if the list holds other types, or ints that floats 
+    don't represent exactly (which NumPy would not format as the 
+    primitive normalization does).
+    """
+    types = set(map(type, values))
+    if not types <= {float, int, bool, type(None)}:
+        return None
+    try:
+        array = numpy.array(values, dtype=float)
+    except OverflowError:
+        return None
+    if int in types and (numpy.abs(array) > 2**53).any():
+        return None
+    return array
+
+def _vector_values(data):
+    """Return a vector as a NumPy array and missing value mask.
+
+    The mask (a boolean array or None) is as for _normalize_numpy().
+    """
+    _import_loaded()
+    if numpy and isinstance(data, numpy.ndarray):
+        if data.ndim != 1:
+            raise ValueError('numpy vectors must be 1-D')
+        return (data, None)
+    if pandas and isinstance(data, pandas.Series):
+        return _pandas_values(data)
+    if pyarrow and isinstance(data, (pyarrow.Array, pyarrow.ChunkedArray)):
+        return _arrow_values(data)
+    msg = 'data must be a NumPy array, pandas series, or Arrow array'
+    raise TypeError(msg)
+
+def _segment_unfs(values, missing, offsets, digits):
+    """Return the UNFs of segments of a NumPy array (see unf_segments()).
+
+    Runs of adjacent segments are formatted together in batches of 
+    about NUMPY_BLOCK_SIZE values; segments longer than that are 
+    normalized by blocks on their own.
+    """
+    lengths = numpy.diff(offsets)
+    unfs = numpy.empty(lengths.shape[0], dtype=object)
+    if digits > NUMPY_MAX_DIGITS:
+        long = numpy.ones(lengths.shape[0], dtype=bool)
+    else:
+        long = lengths > NUMPY_BLOCK_SIZE
+    for i in numpy.flatnonzero(long).tolist():
+        (start, end) = (offsets[i], offsets[i+1])
+        hash = SHA256()
+        for string in _normalize_numpy(values[start:end], 
+                                       digits, 
+                                       missing=_slice(missing, start, end)):
+            hash.update(string)
+        encoded_hash = base64.b64encode(hash.digest()[:HASH_BYTES]).decode()
+        unfs[i] = _unf_string(encoded_hash, digits)
+    # A batch is a run of short segments (between long segments) 
+    # within one NUMPY_BLOCK_SIZE span of values.
+    short = numpy.flatnonzero(~long)
+    run = numpy.cumsum(long)[short]
+    span = (offsets[short] - offsets[0]) // NUMPY_BLOCK_SIZE
+    new_batch = (numpy.diff(run) != 0) | (numpy.diff(span) != 0)
+    bounds = [0] + (numpy.flatnonzero(new_batch) + 1).tolist()
+    bounds.append(short.shape[0])
+    for (first, last) in zip(bounds[:-1], bounds[1:]):
+        if first == last:
+            continue
+        (first, last) = (short[first], short[last-1] + 1)
+        (start, end) = (offsets[first], offsets[last])
+        (buf, ends) = _format_vector(values[start:end], 
+                                     digits, 
+                                     _slice(missing, start, end))
+        segment_bounds = offsets[first:last+1] - start
+        unfs[first:last] = _hash_segments(buf, ends, segment_bounds, digits)
+    return unfs.tolist()
+
+def _format_vector(data, digits, missing=None):
+    """Format a 1-D NumPy array of numbers or strings.
+
+    Returns the normalized values and the offset of the end of each 
+    value, as _format_numpy().
+    """
+    if data.dtype.kind in ['U', 'S', 'O']:
+        return _format_numpy_strings(data, missing)
+    if data.dtype.kind not in ['i', 'u', 'f', 'b']:
+        msg = 'data type must be boolean, integer, floating point, or string'
+        raise ValueError(msg)
+    return _format_numpy(data, digits, missing)
+
+def _hash_segments(buf, ends, bounds, digits):
+    """Return the UNFs of segments of formatted values.
+
+    buf and ends are as returned by _format_numpy(), and segment i is 
+    values bounds[i] to bounds[i+1].
+    """
+    buf = memoryview(buf)
+    ends = numpy.concatenate([[0], ends])[bounds].tolist()
+    digests = b''.join([ SHA256(buf[start:end]).digest() 
+                         for (start, end) in zip(ends[:-1], ends[1:]) ])
+    return _unf_strings(digests, digits)
+
+async def _adigest(data, digits, executor, semaphore):
+    """Calculate the digest of a vector, as aunf() does.
+
+    The vector is digested once the semaphore (an asyncio.Semaphore) 
+    is acquired.
+    """
+    async with semaphore:
+        hasher = UNFHasher(digits)
+        await hasher.aupdate(data, executor)
+    return hasher._encoded_digest()
+
+def _executor_workers(executor):
+    """Return the number of workers of an executor (or None).
+
+    The standard executors keep their number of workers in 
+    _max_workers; for others, and for the event loop's default 
+    executor, this is the number of CPUs.
+    """
+    workers = getattr(executor, '_max_workers', None)
+    if not isinstance(workers, int) or workers < 1:
+        workers = os.cpu_count() or 1
+    return workers
+
+def _slices(data, size):
+    """Split a vector chunk into chunks of at most size values."""
+    n = _count(data)
+    if n <= size:
+        yield data
+        return
+    if pandas and isinstance(data, pandas.Series):
+        data = data.iloc
+    for start in range(0, n, size):
+        yield data[start:start+size]
+    return
+
+def _slice(data, start, end):
+    """Return data[start:end], or None if data is None."""
+    return None if data is None else data[start:end]
+
+def _count(data):
+    """Return the number of values in a vector chunk."""
+    _import_loaded()
+    if isinstance(data, (tuple, list)):
+        return len(data)
+    if numpy and isinstance(data, numpy.ndarray):
+        return data.shape[0]
+    if pandas and isinstance(data, pandas.Series):
+        return len(data)
+    if pyarrow and isinstance(data, (pyarrow.Array, pyarrow.ChunkedArray)):
+        return len(data)
+    return 1
+
+def _check_chunk(data):
+    """Check that data can be a chunk of a vector."""
+    _import_loaded()
+    if numpy and isinstance(data, numpy.ndarray) and data.ndim != 1:
+        raise ValueError('numpy chunks must be 1-D')
+    if _vectors(data) is not None:
+        msg = 'data frames and tables cannot be vector chunks'
+        raise TypeError(msg)
+    return
+
+def _check_digits(digits):
+    """Check the type and value of a digits argument."""
     if not isinstance(digits, int):
         raise TypeError('digits must be an integer')
     if digits < 1:
         raise ValueError('digits must be positive')
+    return
+
+def _digest(obj, digits, executor=None, cache=None):
+    """Calculate the digest of an object."""
+    if cache is not None:
+        vectors = _vectors(obj)
+        if vectors is None or len(vectors) == 1:
+            vector = obj if vectors is None else vectors[0][1]
+            return _digest_vectors([(None, vector)], digits, None, cache)[0]
+    pieces = _iter_normalize(obj, digits, executor, cache)
+    if _profile is not None:
+        pieces = _profile._timed(pieces, _stage(obj))
+        if _vectors(obj) is None:
+            _profile._add(elements=_count(obj))
+    hash = _hash_pieces(SHA256(), pieces)
+    return base64.b64encode(hash.digest()[:HASH_BYTES]).decode()
+
+def _stage(data):
+    """Return the UNFProfile stage in which data is normalized."""
+    if _vectors(data) is not None:
+        return 'collection'
     if numpy and isinstance(data, numpy.ndarray):
-        return _normalize_numpy(data, digits)
-    if pandas and isinstance(data, (pandas.Series, pandas.DataFrame)):
-        return _normalize_pandas(data, digits)
+        return 'numpy'
+    if pandas and isinstance(data, pandas.Series):
+        return 'pandas'
+    if pyarrow and isinstance(data, (pyarrow.Array, pyarrow.ChunkedArray)):
+        return 'arrow'
     if isinstance(data, (tuple, list)):
-        return b''.join([ _normalize_primitive(el, digits) for el in data ])
-    return _normalize_primitive(data, digits)
+        return 'list'
+    return 'primitive'
+
+def _hash_pieces(hash, pieces):
+    """Pass the pieces of a normalized object to a hash.
+
+    The pieces are passed to hash.update() in chunks of at most 
+    HASH_CHUNK_BYTES.  If there is more than one piece (and more than 
+    one CPU), each is hashed in a worker thread while the next is 
+    produced, so at most two are held at once.  (hashlib hashes 
+    release the GIL while hashing.)  Returns the hash.
+    """
+    if (os.cpu_count() or 1) == 1:
+        for piece in pieces:
+            _hash_chunks(hash, piece)
+        return hash
+    pieces = iter(pieces)
+    first = next(pieces, b'')
+    second = next(pieces, None)
+    if second is None:
+        _hash_chunks(hash, first)
+        return hash
+    import concurrent.futures
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as worker:
+        future = worker.submit(_hash_chunks, hash, first)
+        for piece in itertools.chain([second], pieces):
+            future.result()
+            future = worker.submit(_hash_chunks, hash, piece)
+        future.result()
+    return hash
+
+def _hash_chunks(hash, data):
+    """Pass data to hash.update() in chunks of HASH_CHUNK_BYTES."""
+    profile = _profile
+    if profile is not None:
+        with profile._timing('hash', len(data)):
+            _hash_chunks_untimed(hash, data)
+        return
+    _hash_chunks_untimed(hash, data)
+    return
+
+def _hash_chunks_untimed(hash, data):
+    """Pass data to hash.update() in chunks (see _hash_chunks())."""
+    if len(data) <= HASH_CHUNK_BYTES:
+        hash.update(data)
+        return
+    data = memoryview(data)
+    for start in range(0, len(data), HASH_CHUNK_BYTES):
+        hash.update(data[start:start+HASH_CHUNK_BYTES])
+    return
+
+def _normalize(data, digits, executor=None):
+    """Normalize an object to a byte string."""
+    return b''.join(_iter_normalize(data, digits, executor))
+
+def _iter_normalize(data, digits, executor=None, cache=None):
+    """Normalize an object, generating the byte string in pieces.
+
+    Concatenated, the pieces are the normalized object.  Large NumPy 
+    arrays generate one piece per block (see NUMPY_BLOCK_SIZE).
+    """
+    _import_loaded()
+    _check_digits(digits)
+    vectors = _vectors(data)
+    if vectors is not None:
+        # Special case: 
+        #     UNF of a data frame (datafile) with 1 variable:
+        #     The UNF of the data frame is the same as the UNF of the variable.
+        # https://guides.dataverse.org/en/latest/developers/unf/unf-v6.html
+        if len(vectors) == 1:
+            data = vectors[0][1]
+        else:
+            digests = _digest_vectors(vectors, digits, executor, cache)
+            digests.sort()
+            yield _normalize(digests, digits)
+            return
+    if numpy and isinstance(data, numpy.ndarray):
+        yield from _normalize_numpy(data, digits)
+    elif pandas and isinstance(data, pandas.Series):
+        yield from _normalize_pandas(data, digits)
+    elif pyarrow and isinstance(data, (pyarrow.Array, pyarrow.ChunkedArray)):
+        yield from _normalize_arrow(data, digits)
+    elif isinstance(data, (tuple, list)):
+        yield b''.join([ _normalize_primitive(el, digits) for el in data ])
+    else:
+        yield _normalize_primitive(data, digits)
+    return
+
+def _vectors(data):
+    """Split a higher-level object into its vectors.
+
+    The rows of a 2-D NumPy array and the columns of a pandas data frame 
+    or Arrow table or record batch are vectors subject to the 
+    digest-sort-digest rule.  Returns a list of (name, vector) pairs, 
+    where the name is the row index or column name, or None if data is 
+    not a higher-level object.
+    """
+    _import_loaded()
+    if numpy and isinstance(data, numpy.ndarray) and data.ndim == 2:
+        return list(enumerate(data))
+    if pandas and isinstance(data, pandas.DataFrame):
+        return [ (name, data.iloc[:,i]) for (i, name) in enumerate(data) ]
+    if pyarrow and isinstance(data, (pyarrow.Table, pyarrow.RecordBatch)):
+        return list(zip(data.column_names, data.columns))
+    return None
+
+def _digest_vectors(vectors, digits, executor=None, cache=None):
+    """Digest (name, vector) pairs, in parallel if given an executor.
+
+    Returns the digests in the order of the vectors.  Digests found in 
+    the cache, if given, are not recalculated; new digests are stored.
+    """
+    vectors = [ vector for (name, vector) in vectors ]
+    if cache is not None:
+        keys = [ _content_key(vector) for vector in vectors ]
+        found = cache.lookup([ key for key in keys if key is not None ], 
+                             digits)
+        digests = [ found.get(key) for key in keys ]
+        missing = [ i for (i, digest) in enumerate(digests) 
+                    if digest is None ]
+        new = _digest_vectors([ (i, vectors[i]) for i in missing ], 
+                              digits, 
+                              executor)
+        for (i, digest) in zip(missing, new):
+            digests[i] = digest
+        cache.store({ keys[i]: digests[i] 
+                      for i in missing if keys[i] is not None }, 
+                    digits)
+        return digests
+    digests = _short_digests(vectors, digits)
+    long = [ i for (i, digest) in enumerate(digests) if digest is None ]
+    if executor is None:
+        new = [ _digest(vectors[i], digits) for i in long ]
+    else:
+        new = executor.map(_digest, 
+                           [ vectors[i] for i in long ], 
+                           [digits] * len(long))
+    for (i, digest) in zip(long, new):
+        digests[i] = digest
+    return digests
+
+def _short_digests(vectors, digits):
+    """Digest the short vectors of a collection together.
+
+    Normalizing a vector on its own has a fixed cost that dominates 
+    for short vectors (the rows of a tall 2-D array or the columns of 
+    a wide data frame).  Runs of vectors of at most NUMPY_BLOCK_SIZE 
+    values and of one data type are instead formatted together in 
+    batches of about NUMPY_BLOCK_SIZE values, and the part of each 
+    vector hashed separately, as _segment_unfs() does.  Returns a list 
+    of digests, with None for the vectors left to _digest().
+    """
+    digests = [None] * len(vectors)
+    if not numpy or digits > NUMPY_MAX_DIGITS:
+        return digests
+    batch = []
+    size = 0
+    for (i, vector) in enumerate(vectors):
+        values = _short_vector_values(vector)
+        if batch and (values is None 
+                      or _batch_type(values[0]) != _batch_type(batch[0][1]) 
+                      or size + values[0].shape[0] > NUMPY_BLOCK_SIZE):
+            _digest_batch(batch, vectors, digits, digests)
+            (batch, size) = ([], 0)
+        if values is not None:
+            batch.append((i, *values))
+            size += values[0].shape[0]
+    if batch:
+        _digest_batch(batch, vectors, digits, digests)
+    return digests
+
+def _short_vector_values(vector):
+    """Return the values and missing mask of a short vector, or None.
+
+    None is returned for vectors longer than NUMPY_BLOCK_SIZE values 
+    and for those that are not NumPy arrays, pandas series, or Arrow 
+    arrays of a supported type.
+    """
+    if not (isinstance(vector, numpy.ndarray) 
+            or pandas and isinstance(vector, pandas.Series) 
+            or pyarrow and isinstance(vector, (pyarrow.Array, 
+                                               pyarrow.ChunkedArray))):
+        return None
+    if _count(vector) > NUMPY_BLOCK_SIZE:
+        return None
+    try:
+        (values, missing) = _vector_values(vector)
+    except (TypeError, ValueError):
+        return None
+    if values.dtype.kind not in ['i', 'u', 'f', 'b', 'U', 'S', 'O']:
+        return None
+    return (values, missing)
+
+def _batch_type(values):
+    """Return the type of values that can be formatted together.
+
+    Numbers must have the same data type to be concatenated without 
+    conversion; strings need only be of the same kind.
+    """
+    if values.dtype.kind in ['U', 'S', 'O']:
+        return values.dtype.kind
+    return values.dtype
+
+def _digest_batch(batch, vectors, digits, digests):
+    """Set the digests of a batch of (index, values, missing) vectors.
+
+    If the values can't be formatted together (an object array holds 
+    something other than strings), the vectors are left to _digest(), 
+    which reports the error.
+    """
+    (indexes, values, masks) = zip(*batch)
+    lengths = [ v.shape[0] for v in values ]
+    values = numpy.concatenate(values)
+    if all( m is None for m in masks ):
+        missing = None
+    else:
+        missing = numpy.concatenate([ 
+            numpy.zeros(n, dtype=bool) if m is None else m 
+            for (n, m) in zip(lengths, masks) 
+        ])
+    bounds = numpy.concatenate([[0], numpy.cumsum(lengths)])
+    profile = _profile
+    try:
+        if profile is None:
+            (buf, ends) = _format_vector(values, digits, missing)
+        else:
+            with profile._timing(_stage(vectors[indexes[0]])):
+                (buf, ends) = _format_vector(values, digits, missing)
+    except ValueError:
+        return
+    if profile is None:
+        unfs = _hash_segments(buf, ends, bounds, digits)
+    else:
+        profile._add(elements=values.shape[0])
+        with profile._timing('hash', len(buf)):
+            unfs = _hash_segments(buf, ends, bounds, digits)
+    prefix = len(_unf_string('', digits))
+    for (i, u) in zip(indexes, unfs):
+        digests[i] = u[prefix:]
+    return
+
+def _content_key(data):
+    """Return a key identifying a vector by its contents.
+
+    The key is a hash (CACHE_KEY_BYTES long) of the contents (see 
+    _content_hash()).  Returns None if the vector can't be identified; 
+    it is then never cached.
+    """
+    hash = _content_hash(data, hashlib.blake2b(digest_size=CACHE_KEY_BYTES))
+    if hash is None:
+        return None
+    return 'content:' + hash.hexdigest()
+
+def _content_hash(data, hash):
+    """Hash the contents of a vector.
+
+    The data type and the raw values (and missing value masks) of the 
+    vector, or the pickled vector for Python objects, are passed to 
+    hash.  Returns the hash, or None if the vector can't be identified.
+    """
+    _import_loaded()
+    if pyarrow and isinstance(data, (pyarrow.Array, pyarrow.ChunkedArray)):
+        # arrays and chunked arrays of the same values are the same
+        hash.update(b'Array')
+    else:
+        hash.update(type(data).__qualname__.encode())
+    if numpy and isinstance(data, numpy.ndarray):
+        if data.ndim != 1:
+            return None
+        hash.update(data.dtype.str.encode())
+        if data.dtype.kind == 'O':
+            hash.update(pickle.dumps(data.tolist()))
+        else:
+            hash.update(numpy.ascontiguousarray(data))
+    elif pandas and isinstance(data, pandas.Series):
+        dtype = data.dtype
+        hash.update(str(dtype).encode())
+        if isinstance(dtype, numpy.dtype) and dtype.kind != 'O':
+            hash.update(numpy.ascontiguousarray(data.to_numpy()))
+        elif isinstance(dtype, numpy.dtype) or _is_pandas_string(dtype):
+            values = data.to_numpy(dtype=object, na_value=None)
+            hash.update(pickle.dumps(values.tolist()))
+        elif dtype.kind in ['i', 'u', 'f', 'b']:
+            values = data.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+            hash.update(numpy.ascontiguousarray(values))
+            hash.update(data.isna().to_numpy())
+        else:
+            return None
+    elif pyarrow and isinstance(data, (pyarrow.Array, pyarrow.ChunkedArray)):
+        hash.update(str(data.type).encode())
+        if isinstance(data, pyarrow.Array):
+            chunks = [data]
+        else:
+            chunks = data.chunks
+        # The values, string lengths, and missing value mask are each 
+        # hashed across all the chunks, so the hash depends only on the 
+        # logical values and not on the chunks (see _hash_arrow_chunk()).
+        parts = [ SHA256() for i in range(3) ]
+        for chunk in chunks:
+            if not _hash_arrow_chunk(chunk, *parts):
+                return None
+        for part in parts:
+            hash.update(part.digest())
+    else:
+        try:
+            hash.update(pickle.dumps(data))
+        except Exception:
+            return None
+    return hash
+
+def _hash_arrow_chunk(data, values_hash, lengths_hash, missing_hash):
+    """Hash the logical values of an Arrow array (see _content_hash()).
+
+    Only the values of the array itself (not of the buffers of an array 
+    it is a slice of) are hashed, with missing values zeroed (or empty, 
+    for strings) and the mask unpacked to a byte per value, so that the 
+    hashes are those of the concatenated values of a chunked array.  
+    Returns False if the data type is not supported.
+    """
+    if pyarrow.types.is_dictionary(data.type):
+        data = data.dictionary_decode()
+    missing = _arrow_missing(data)
+    if missing is None:
+        missing = numpy.zeros(len(data), dtype=bool)
+    missing_hash.update(missing)
+    if pyarrow.types.is_null(data.type):
+        return True
+    if pyarrow.types.is_string(data.type) \
+            or pyarrow.types.is_large_string(data.type):
+        if missing.any():
+            data = data.fill_null('')
+        buffers = data.buffers()
+        if pyarrow.types.is_string(data.type):
+            dtype = numpy.dtype('int32')
+        else:
+            dtype = numpy.dtype('int64')
+        offsets = numpy.frombuffer(buffers[1], 
+                                   dtype=dtype, 
+                                   count=len(data)+1, 
+                                   offset=data.offset*dtype.itemsize)
+        lengths_hash.update(numpy.diff(offsets).astype('int64'))
+        if buffers[2] is not None:
+            values_hash.update(memoryview(buffers[2])[offsets[0]:offsets[-1]])
+        return True
+    try:
+        (values, mask) = _arrow_values(data)
+    except ValueError:
+        return False
+    if missing.any():
+        values = values.copy()
+        values[missing] = 0
+    values_hash.update(numpy.ascontiguousarray(values))
+    return True
 
 def _normalize_primitive(data, digits):
     """Normalize a value of a simple data type."""
@@ -68,6 +1498,11 @@ def _normalize_primitive(data, digits):
     if isinstance(data, str):
         return data.encode()[:STRING_CHARACTERS] + b'\n\0'
     if isinstance(data, (int, float)):
+        # The cache can't tell -0.0 from 0.0, and nan never equals 
+        # itself (so each nan would be a miss evicting an entry), but 
+        # both are quick anyway.
+        if data and data == data:
+            return _normalize_number_cached(data, digits)
         return _normalize_number(data, digits)
     raise TypeError('unsupported type for data')
 
@@ -91,8 +1526,19 @@ def _normalize_number(data, digits):
         data = -data
     else:
         sign = '+'
-    exp = int(math.floor(math.log10(data)))
-    data_s = str(_rint(data * 10**(digits-1-exp)))
+    exp = _exponent(data)
+    n_int = _rint(_scale(data, digits-1-exp))
+    # log10() can overshoot for values just under a power of 10 (and 
+    # for subnormals), leaving us a digit short.
+    if n_int < 10**(digits-1):
+        exp -= 1
+        n_int = _rint(_scale(data, digits-1-exp))
+    # Rounding can carry into an extra digit (9.9999999 to 10000000 for 
+    # 7 digits), in which case the value is really 10**(exp+1).
+    if n_int == 10**digits:
+        n_int //= 10
+        exp += 1
+    data_s = str(n_int)
     i_part = data_s[0]
     f_part = data_s[1:].rstrip('0')
     if exp == 0:
@@ -101,6 +1547,64 @@ def _normalize_number(data, digits):
         data = f'{sign}{i_part}.{f_part}e{exp:+d}\n\0'
     return data.encode()
 
+# Real columns repeat values heavily, so we keep the normalized forms 
+# of recent numbers.  (typed, so that ints and floats are cached 
+# apart.)
+_normalize_number_cached = functools.lru_cache(maxsize=NUMBER_CACHE_SIZE, 
+                                               typed=True)(_normalize_number)
+
+def _scale(data, scale):
+    """Multiply a float by 10**scale.
+
+    10**scale overflows a float for the smallest values, so we scale 
+    those in two steps (as R does).  Python converts the integer 
+    10**scale to the nearest float, and the NumPy code uses the same 
+    powers (see _pow10()).
+    """
+    if scale > MAX_SCALE:
+        data *= 10**MAX_SCALE
+        scale -= MAX_SCALE
+    return data * 10**scale
+
+def _exponent(data):
+    """Return floor(math.log10(data)) for a positive float.
+
+    With FREXP_EXPONENTS, the binary exponent from frexp() puts 
+    log10(data) within log10(2) below an estimate, which is lowered by 
+    one if data is below the point at which log10() reaches the 
+    estimate (see _exponent_steps()).  This gives the same result as 
+    log10(), just under powers of 10 included.
+    """
+    if not FREXP_EXPONENTS:
+        return math.floor(math.log10(data))
+    exp = math.floor(math.frexp(data)[1] * _LOG10_2)
+    if data < _exponent_steps()[exp-MIN_EXPONENT]:
+        exp -= 1
+    return exp
+
+_LOG10_2 = math.log10(2)
+
+@functools.cache
+def _exponent_steps(numpy_log10=False):
+    """Return the smallest floats with each floor(log10()).
+
+    Item i is the smallest positive float x for which 
+    floor(log10(x)) is MIN_EXPONENT+i (or 0.0 for MIN_EXPONENT), 
+    where log10() is math.log10(), or numpy.log10() if numpy_log10 is 
+    true (as a NumPy array).  Starting from the powers of 10, we step 
+    to the neighbouring floats until log10() changes.
+    """
+    log10 = numpy.log10 if numpy_log10 else math.log10
+    steps = [0.0]
+    for n in range(MIN_EXPONENT+1, MAX_SCALE+1):
+        x = float(10**n) if n >= 0 else 10**n
+        while log10(math.nextafter(x, 0)) >= n:
+            x = math.nextafter(x, 0)
+        while log10(x) < n:
+            x = math.nextafter(x, math.inf)
+        steps.append(x)
+    return numpy.array(steps) if numpy_log10 else steps
+
 def _rint(n):
     """Round n to the nearest integer, towards even if a tie."""
     n_int = int(math.floor(n))
@@ -108,140 +1612,1096 @@ def _rint(n):
         return n_int + 1 if n_int % 2 else n_int
     return int(round(n))
 
+# --- resumable hashing -------------------------------------------------
+
+class _SHA256:
+
+    """A SHA-256 hash whose state can be saved and restored.
+
+    hashlib hashes can't be saved.  This hash is computed by the 
+    SHA-256 functions of the OpenSSL library (libcrypto, through 
+    ctypes), whose state structure is public, or in pure Python (which 
+    is much slower) if the library can't be loaded.
+
+    The saved state (state(), or the argument to the constructor) is 
+    portable: the eight hash words (big-endian), the number of bytes 
+    hashed (as an eight-byte big-endian integer), and the bytes of the 
+    last, incomplete block.
+    """
+
+    def __init__(self, state=None):
+        self._lib = _libcrypto()
+        if state is None:
+            state = struct.pack('>8LQ', *_SHA256_H0, 0)
+        if len(state) < 40:
+            raise ValueError('bad SHA-256 state')
+        (h, length, tail) = (list(struct.unpack('>8L', state[:32])), 
+                             struct.unpack('>Q', state[32:40])[0], 
+                             state[40:])
+        if len(tail) != length % 64:
+            raise ValueError('bad SHA-256 state')
+        if self._lib is None:
+            (self._h, self._length, self._tail) = (h, length, tail)
+        else:
+            import ctypes
+            self._ctx = _sha256_ctx()()
+            self._lib.SHA256_Init(ctypes.byref(self._ctx))
+            self._ctx.h[:] = h
+            self._ctx.Nl = (8 * length) & 0xffffffff
+            self._ctx.Nh = (8 * length) >> 32
+            ctypes.memmove(self._ctx.data, tail, len(tail))
+            self._ctx.num = len(tail)
+        return
+
+    def update(self, data):
+        data = bytes(data)
+        if self._lib is not None:
+            import ctypes
+            self._lib.SHA256_Update(ctypes.byref(self._ctx), data, len(data))
+            return
+        data = self._tail + data
+        n = len(data) - len(data) % 64
+        h = self._h
+        for i in range(0, n, 64):
+            h = _sha256_compress(h, data[i:i+64])
+        self._h = h
+        self._length += len(data) - len(self._tail)
+        self._tail = data[n:]
+        return
+
+    def copy(self):
+        other = self.__class__.__new__(self.__class__)
+        other._lib = self._lib
+        if self._lib is None:
+            (other._h, other._length, other._tail) = \
+                (self._h, self._length, self._tail)
+        else:
+            other._ctx = _sha256_ctx().from_buffer_copy(self._ctx)
+        return other
+
+    def digest(self):
+        if self._lib is not None:
+            import ctypes
+            ctx = _sha256_ctx().from_buffer_copy(self._ctx)
+            out = ctypes.create_string_buffer(32)
+            self._lib.SHA256_Final(out, ctypes.byref(ctx))
+            return out.raw
+        # padding: 0x80, zeros, and the length in bits
+        data = self._tail + b'\x80' + b'\0' * ((55 - len(self._tail)) % 64)
+        data += struct.pack('>Q', 8 * self._length)
+        h = self._h
+        for i in range(0, len(data), 64):
+            h = _sha256_compress(h, data[i:i+64])
+        return struct.pack('>8L', *h)
+
+    def state(self):
+        """Return the state of the hash (see the class docstring)."""
+        if self._lib is None:
+            (h, length, tail) = (self._h, self._length, self._tail)
+        else:
+            import ctypes
+            h = list(self._ctx.h)
+            length = ((self._ctx.Nh << 32) | self._ctx.Nl) // 8
+            tail = ctypes.string_at(self._ctx.data, self._ctx.num)
+        return struct.pack('>8LQ', *h, length) + tail
+
+@functools.cache
+def _sha256_ctx():
+    """Return the ctypes structure of the OpenSSL hash state."""
+    import ctypes
+    class _SHA256_CTX(ctypes.Structure):
+        # SHA256_CTX in openssl/sha.h
+        _fields_ = [
+            ('h', ctypes.c_uint32 * 8), 
+            ('Nl', ctypes.c_uint32), 
+            ('Nh', ctypes.c_uint32), 
+            ('data', ctypes.c_uint32 * 16), 
+            ('num', ctypes.c_uint32), 
+            ('md_len', ctypes.c_uint32), 
+        ]
+    return _SHA256_CTX
+
+@functools.cache
+def _libcrypto():
+    """Load the OpenSSL library for _SHA256, or return None.
+
+    The library is the one hashlib uses, found through the _hashlib 
+    module linked against it, so it is already loaded and no other 
+    build of OpenSSL is picked up.  (On Windows, symbols aren't looked 
+    up in the libraries a module is linked against, so we load the 
+    library beside the module.)  A known digest is checked before the 
+    library is used.  If it can't be loaded, a RuntimeWarning is issued, 
+    as the pure Python fallback is very slow.
+    """
+    import ctypes
+    try:
+        import _hashlib
+        paths = [_hashlib.__file__]
+        paths += glob.glob(os.path.join(os.path.dirname(_hashlib.__file__), 
+                                        'libcrypto*.dll'))
+    except (ImportError, AttributeError):
+        paths = []
+    for path in paths:
+        try:
+            lib = ctypes.CDLL(path)
+            for name in ('SHA256_Init', 'SHA256_Update', 'SHA256_Final'):
+                getattr(lib, name).restype = ctypes.c_int
+            lib.SHA256_Update.argtypes = [ctypes.c_void_p, 
+                                          ctypes.c_void_p, 
+                                          ctypes.c_size_t]
+        except (OSError, AttributeError):
+            continue
+        ctx = _sha256_ctx()()
+        out = ctypes.create_string_buffer(32)
+        lib.SHA256_Init(ctypes.byref(ctx))
+        lib.SHA256_Update(ctypes.byref(ctx), b'abc', 3)
+        lib.SHA256_Final(out, ctypes.byref(ctx))
+        if out.raw == hashlib.sha256(b'abc').digest():
+            return lib
+    msg = 'the OpenSSL library could not be loaded, so resumable hashes ' \
+          '(unf_resume() and resumable UNFHashers) are computed in pure ' \
+          'Python, which is very slow'
+    warnings.warn(msg, RuntimeWarning)
+    return None
+
+_SHA256_H0 = (
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 
+    0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19, 
+)
+
+_SHA256_K = (
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 
+    0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5, 
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 
+    0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174, 
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 
+    0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da, 
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 
+    0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967, 
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 
+    0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85, 
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 
+    0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070, 
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 
+    0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3, 
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 
+    0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2, 
+)
+
+def _sha256_compress(h, block):
+    """Apply the SHA-256 compression function to a 64-byte block."""
+    m = 0xffffffff
+    w = list(struct.unpack('>16L', block))
+    for i in range(16, 64):
+        (x, y) = (w[i-15], w[i-2])
+        s0 = ((x >> 7 | x << 25) ^ (x >> 18 | x << 14) ^ (x >> 3)) & m
+        s1 = ((y >> 17 | y << 15) ^ (y >> 19 | y << 13) ^ (y >> 10)) & m
+        w.append((w[i-16] + s0 + w[i-7] + s1) & m)
+    (a, b, c, d, e, f, g, hh) = h
+    for i in range(64):
+        s1 = (e >> 6 | e << 26) ^ (e >> 11 | e << 21) ^ (e >> 25 | e << 7)
+        t1 = hh + (s1 & m) + ((e & f) ^ (~e & g)) + _SHA256_K[i] + w[i]
+        s0 = (a >> 2 | a << 30) ^ (a >> 13 | a << 19) ^ (a >> 22 | a << 10)
+        t2 = (s0 & m) + ((a & b) ^ (a & c) ^ (b & c))
+        (a, b, c, d, e, f, g, hh) = \
+            ((t1 + t2) & m, a, b, c, (d + t1) & m, e, f, g)
+    return [ (x + y) & m for (x, y) in zip(h, (a, b, c, d, e, f, g, hh)) ]
+
 # --- numpy functionality -----------------------------------------------
 
-def _normalize_numpy(data, digits):
+def _normalize_numpy(data, digits, block_size=None, missing=None):
     """Normalize a numpy array.
 
-    The array must have a numeric data type.
-    """
+    The array must have a numeric (or boolean) or string data type; 
+    object arrays must hold only strings and None.  This is a 
+    generator; 1-D arrays are normalized (and the pieces generated) 
+    block_size elements at a time, NUMPY_BLOCK_SIZE by default.
 
-    if not numpy.issubdtype(data.dtype, int) \
-            and not numpy.issubdtype(data.dtype, float):
-        raise ValueError('data type must be integer or floating point')
+    missing, if given, is a boolean array marking missing values.
+    """
 
-    if data.ndim == 2:
-        if data.shape[0] == 1:
-            data = data.ravel()
-    elif data.ndim != 1:
+    # 2-D arrays don't get here; _iter_normalize() splits them into 
+    # vectors.
+    if data.ndim != 1:
         raise ValueError('numpy arrays must be 1- or 2-D')
 
-    # --- find special values and record signs, make all values positive, 
-    # --- then replace special values with dummy numbers
+    if data.dtype.kind in ['U', 'S', 'O']:
+        yield from _normalize_strings(data, block_size, missing)
+        return
+
+    if data.dtype.kind not in ['i', 'u', 'f', 'b']:
+        msg = 'data type must be boolean, integer, floating point, or string'
+        raise ValueError(msg)
+
+    if block_size is None:
+        block_size = NUMPY_BLOCK_SIZE
+    for start in range(0, data.shape[0], block_size):
+        block = data[start:start+block_size]
+        if missing is None:
+            block_missing = None
+        else:
+            block_missing = missing[start:start+block_size]
+        if digits > NUMPY_MAX_DIGITS:
+            vals = [ float(v) for v in block ]
+            if block_missing is not None:
+                vals = [ None if m else v 
+                         for (v, m) in zip(vals, block_missing) ]
+            yield _normalize(vals, digits)
+        else:
+            buf = _format_numpy_range(block, digits, block_missing)
+            if buf is None:
+                buf = _format_numpy(block, digits, block_missing)[0]
+            yield buf
+
+    return
+
+def _format_numpy_range(data, digits, missing=None):
+    """Normalize a 1-D numpy array of integers in a small range.
+
+    Columns of codes, flags, counts, and years have only a few 
+    distinct values, each repeated many times.  If the values of data 
+    are integers (of any data type) spanning at most 
+    1/VALUE_TABLE_RATIO as many values as data has, each value in the 
+    range is formatted once (by _format_numpy()) into a fixed-width 
+    row, and the rows are gathered by value and packed as in 
+    _format_numpy().  Returns bytes, or None if data is not such an 
+    array.
+
+    missing, if given, is a boolean array marking missing values.
+    """
+    if data.shape[0] < VALUE_TABLE_RATIO:
+        return None
+    if data.dtype.kind == 'b':
+        data = data.view('uint8')
+    elif data.dtype.kind == 'f':
+        # missing values may be nan
+        if missing is not None:
+            data = numpy.where(missing, 0, data)
+        with numpy.errstate(invalid='ignore'):
+            ints = data.astype('int64')
+        if not (ints == data).all():
+            return None
+        # -0.0 is not 0
+        if (numpy.signbit(data) & (ints == 0)).any():
+            return None
+        data = ints
+    (lo, hi) = (int(data.min()), int(data.max()))
+    if (hi - lo + 1) * VALUE_TABLE_RATIO > data.shape[0]:
+        return None
+    (buf, ends) = _format_numpy(numpy.arange(lo, hi+1, dtype=data.dtype), 
+                                digits)
+    starts = ends - numpy.diff(ends, prepend=0)
+    # the last row is the missing value
+    rows = numpy.full((hi-lo+2, int((ends - starts).max())), 
+                      _DROP, 
+                      dtype='uint8')
+    for (i, (start, end)) in enumerate(zip(starts, ends)):
+        rows[i,:end-start] = buf[start:end]
+    rows[-1,:3] = 0
+    if data.dtype == 'uint64':
+        index = (data - numpy.uint64(lo)).astype('int64')
+    else:
+        index = data.astype('int64') - lo
+    if missing is not None:
+        index[missing] = hi - lo + 1
+    return rows[index].tobytes().translate(None, bytes([_DROP]))
+
+def _format_numpy(data, digits, missing=None):
+    """Format a 1-D numeric numpy array.
+
+    Returns the normalized values as one uint8 array and the offset of 
+    the end of each value in that array.  The characters are written 
+    as bytes into one fixed-width row per value, which are then packed, 
+    so no per-value strings are built.
+
+    missing, if given, is a boolean array marking missing values.
+    """
+
+    # --- shift the decimal points and round
+    (negative, n_int, exp, nan_inds, special) = _scale_floats(data, digits)
+
+    # --- write the values into fixed-width rows
+    # Each row is a series of four-byte slots: 
+    #     <sign><digit>.    one slot
+    #     <3 digits>        one slot per three fractional digits 
+    #                       (padded with zeros)
+    #     <sign><3 digits>  the exponent
+    #     \n\0
+    # with 'e' in the unused fourth byte of the last fractional slot 
+    # (or the first slot if there are no fractional digits).  Trailing 
+    # zeros are dropped from the fractional digits and leading zeros 
+    # from the exponent (which has no digits at all if zero).  We fill 
+    # the dropped and unused bytes with a byte that cannot otherwise 
+    # appear and then delete every occurrence of that byte at once.
+    tables = _digit_tables()
+    n_groups = -(-(digits-1) // 3)
+    rows = numpy.empty((data.shape[0], n_groups+3), dtype='=u4')
+    (n_ipart, n_fpart) = numpy.divmod(n_int, 10**(digits-1))
+    head = 10 * negative + n_ipart
+    if n_groups == 0:
+        head += 20
+    rows[:,0] = tables['head'][head]
+    n_fpart *= 10**(3*n_groups-digits+1)
+    f_len = numpy.full(n_fpart.shape, 3*n_groups, dtype='int64')
+    # all_zero is true where all digits to the right are zero, so 
+    # trailing zeros in the group are dropped
+    all_zero = numpy.ones(n_fpart.shape, dtype=bool)
+    for i in range(n_groups, 0, -1):
+        (n_fpart, group) = numpy.divmod(n_fpart, 1000)
+        if i == n_groups:
+            rows[:,i] = tables['frac'][group + 1000*all_zero + 2000]
+        else:
+            rows[:,i] = tables['frac'][group + 1000*all_zero]
+        f_len -= tables['n_trailing'][group] * all_zero
+        all_zero &= group == 0
+    rows[:,-2] = tables['exp'][exp+999]
+    rows[:,-1] = tables['tail']
+    lengths = 7 + f_len + tables['exp_lengths'][exp+999]
+
+    # --- special values
+    if special.any():
+        lengths[special] = 6
+        rows[special,1:-1] = tables['drop']
+        rows[nan_inds,0] = tables['nan']
+        rows[special & ~nan_inds & ~negative,0] = tables['+inf']
+        rows[special & negative,0] = tables['-inf']
+
+    # --- missing values
+    if missing is not None and missing.any():
+        lengths[missing] = 3
+        rows[missing,1:] = tables['drop']
+        rows[missing,0] = tables['missing']
+
+    buf = rows.tobytes().translate(None, bytes([_DROP]))
+    buf = numpy.frombuffer(buf, dtype='uint8')
+    ends = numpy.cumsum(lengths)
+
+    return (buf, ends)
+
+def _scale_floats(data, digits):
+    """Shift the decimal points of numbers and round.
+
+    Returns the signs (true where negative, but never for nan), the 
+    rounded digits-digit integers, and the exponents, with (0, 0) for 
+    zeros and special values, and the nan and special (nan and 
+    infinite) values.
+    """
+
+    data = data.astype(float, copy=False)
+
+    # --- find special values and record signs, then replace special 
+    # --- values with dummy numbers
     nan_inds = numpy.isnan(data)
-    inf_inds = numpy.isinf(data)
-    zero_inds = data == 0.0
-    signs = numpy.copysign(1, data)
-    data_c = signs * data
-    data_c[nan_inds | inf_inds | zero_inds] = 1.0
+    negative = numpy.signbit(data) & ~nan_inds
+    special = ~numpy.isfinite(data)
+    data_c = numpy.abs(data)
+    zero_inds = data_c == 0.0
+    data_c[special | zero_inds] = 1.0
 
     # --- shift the decimal points and round
-    exp = numpy.floor(numpy.log10(data_c)).astype(int)
-    # These values shouldn't be possible since we check for data subtypes 
-    # of int or float before we use this function.  We therefore can't 
-    # test this without calling this function directly.  But we leave 
-    # this in place for unanticipated paths to get here.
+    exp = _exponent_numpy(data_c)
+    # These values shouldn't be possible since we convert to float 
+    # above.  We therefore can't test this without calling this function 
+    # directly.  But we leave this in place for unanticipated paths to 
+    # get here.
     if (exp > 999).any():
         raise ValueError('value overflow (exponent too large)')
     if (exp < -999).any():
         raise ValueError('value underflow (exponent too small)')
-    n_int = numpy.rint(
-        data_c * numpy.float_power(10, (digits-1-exp))
-    ).astype(int)
-
-    # --- generate normalization strings
-
-    s = numpy.full(n_int.shape, '+', dtype='S{}'.format(digits+7))
-    s[signs < 0] = b'-'
-
-    dpow = 10**(digits-1)
-    n_ipart = numpy.floor_divide(n_int, dpow)
-    n_fpart = n_int % dpow
-
-    n_ipart = n_ipart.astype('uint8') + ord(b'0')
-    n_ipart.dtype = 'S1'
-
-    s += n_ipart + b'.'
-
-    n_fpart_s = numpy.empty((digits-1, *n_fpart.shape), dtype='uint8')
-    for i in range(digits-1):
-        n_fpart_s[i,:] = n_fpart % 10
-        n_fpart //= 10
-    n_fpart_s += ord(b'0')
-    n_fpart_s.dtype = 'S1'
-    remove = numpy.full(n_fpart.shape, True)
-    for i in range(digits-1):
-        remove &= n_fpart_s[i,:] == b'0'
-        n_fpart_s[i,remove] = b''
-    for i in range(digits-2, -1, -1):
-        s += n_fpart_s[i,]
-
-    # minus signs will come from the exponent itself
-    exp_sign_arr = numpy.full(n_int.shape, '+', dtype='S1')
-    exp_sign_arr[exp < 0] = b'-'
-    exp = numpy.abs(exp)
-
-    s += b'e' + exp_sign_arr
-
-    exp_s = numpy.empty((3, *exp.shape), dtype='uint8')
-
-    for i in range(3):
-        exp_s[i,:] = exp % 10
-        exp //= 10
-    exp_s += ord(b'0')
-    exp_s.dtype = 'S1'
-    remove = numpy.full(exp.shape, True)
-    for i in range(2, -1, -1):
-        remove &= exp_s[i,:] == b'0'
-        exp_s[i,remove] = b''
-
-    s += exp_s[2,:]+exp_s[1,:]+exp_s[0,:]
-
-    # --- set normalization strings for special values
-    s[nan_inds] = b'+nan'
-    s[numpy.logical_and(inf_inds, signs > 0)] = b'+inf'
-    s[numpy.logical_and(inf_inds, signs < 0)] = b'-inf'
-    s[numpy.logical_and(zero_inds, signs > 0)] = b'+0.e+'
-    s[numpy.logical_and(zero_inds, signs < 0)] = b'-0.e+'
-
-    if s.ndim == 1:
-        data = b'\n\0'.join(s) + b'\n\0'
-    else:
-        digests = [ _digest(b'\n\0'.join(row).decode(), digits) for row in s ]
-        digests.sort()
-        return _normalize(digests, digits)
-
-    return data
+    n_int = _scale_numpy(data_c, digits-1-exp)
+    # See _normalize_number() for these corrections.
+    short = n_int < 10**(digits-1)
+    if short.any():
+        exp[short] -= 1
+        n_int[short] = _scale_numpy(data_c[short], digits-1-exp[short])
+    carry = n_int == 10**digits
+    n_int[carry] //= 10
+    exp[carry] += 1
+    n_int[zero_inds] = 0
+    exp[zero_inds] = 0
+    return (negative, n_int, exp, nan_inds, special)
+
+def _exponent_numpy(data):
+    """Return floor(numpy.log10(data)) for an array of positive floats.
+
+    This is the NumPy version of _exponent().
+    """
+    if not FREXP_EXPONENTS:
+        return numpy.floor(numpy.log10(data)).astype('int64')
+    exp = numpy.floor(numpy.frexp(data)[1] * _LOG10_2).astype('int64')
+    exp -= data < _exponent_steps(numpy_log10=True)[exp-MIN_EXPONENT]
+    return exp
+
+def _scale_numpy(data, scale):
+    """Multiply an array by 10**scale and round to integers.
+
+    This is the NumPy version of _rint(_scale(data, scale)).
+    """
+    pow10 = _pow10()
+    tiny = scale > MAX_SCALE
+    if tiny.any():
+        data = data.copy()
+        data[tiny] *= pow10[2*MAX_SCALE]
+        scale = numpy.where(tiny, scale-MAX_SCALE, scale)
+    return numpy.rint(data * pow10[scale+MAX_SCALE]).astype('int64')
+
+@functools.cache
+def _pow10():
+    """Return the powers 10**-MAX_SCALE through 10**MAX_SCALE.
+
+    Index i holds 10**(i-MAX_SCALE), the float nearest the exact power, 
+    as Python gives for 10**n.  (numpy.float_power() is not always the 
+    nearest float.)
+    """
+    return numpy.array([ float(10**n) if n >= 0 else 10**n 
+                         for n in range(-MAX_SCALE, MAX_SCALE+1) ])
+
+# filler for unused positions in _format_numpy() rows
+_DROP = 0xff
+
+@functools.cache
+def _digit_tables():
+    """Return the four-byte slots used by _format_numpy().
+
+    The slots are given as (native) unsigned 32-bit integers:
+
+        head[10*negative+d]: sign, digit d, and .; add 20 for the 
+            version with e at the end
+        frac[n]: the three digits of n (with leading zeros); add 1000 
+            for the version with trailing zeros dropped and 2000 for 
+            the versions with e at the end
+        exp[e+999]: the sign and digits of exponent e
+        tail: \n\0
+        missing: the missing value
+        drop: nothing
+        nan, +inf, -inf: the special values (with sign)
+
+    n_trailing[n] is the number of trailing zeros of n and 
+    exp_lengths[e+999] the number of digits of exponent e.
+    """
+    def slots(strings):
+        strings = [ s.ljust(4, drop) for s in strings ]
+        return numpy.frombuffer(b''.join(strings), dtype='=u4')
+    drop = bytes([_DROP])
+    head = [ sign + b'%d.' % d for sign in (b'+', b'-') for d in range(10) ]
+    digits = [ b'%03d' % n for n in range(1000) ]
+    stripped = [ s.rstrip(b'0').ljust(3, drop) for s in digits ]
+    exp = [ b'%+d' % e if e else b'+' for e in range(-999, 1000) ]
+    exp = [ s[:1] + s[1:].rjust(3, drop) for s in exp ]
+    tables = {
+        'head': slots(head + [ s + b'e' for s in head ]), 
+        'frac': slots(digits + stripped + 
+                      [ s + b'e' for s in digits + stripped ]), 
+        'exp': slots(exp), 
+        'tail': slots([b'\n\0'])[0], 
+        'missing': slots([b'\0\0\0'])[0], 
+        'drop': slots([drop])[0], 
+        'nan': slots([b'+nan'])[0], 
+        '+inf': slots([b'+inf'])[0], 
+        '-inf': slots([b'-inf'])[0], 
+        'n_trailing': numpy.array([ 3 - len(s.rstrip(b'0')) 
+                                    for s in digits ]), 
+        'exp_lengths': numpy.array([ len(str(abs(e))) if e else 0 
+                                     for e in range(-999, 1000) ]), 
+    }
+    return tables
+
+# --- string functionality ----------------------------------------------
+
+def _normalize_strings(data, block_size=None, missing=None):
+    """Normalize a NumPy array of strings.
+
+    The array may have a unicode (U) or bytes (S) data type or be an 
+    object array of strings and None (missing values).  Bytes are 
+    taken to be UTF-8 already.  This is a generator, as 
+    _normalize_numpy().
+
+    missing, if given, is a boolean array marking missing values.
+    """
+    if block_size is None:
+        block_size = NUMPY_BLOCK_SIZE
+    for start in range(0, data.shape[0], block_size):
+        block = data[start:start+block_size]
+        if missing is None:
+            block_missing = None
+        else:
+            block_missing = missing[start:start+block_size]
+        yield _format_numpy_strings(block, block_missing)[0]
+    return
+
+def _format_numpy_strings(data, missing=None):
+    """Format a 1-D NumPy array of strings.
+
+    Returns the normalized values and the offset of the end of each 
+    value, as _format_numpy().
+    """
+    if missing is not None:
+        missing = numpy.array(missing)
+    if data.dtype.kind == 'O':
+        nones = numpy.equal(data, None)
+        if missing is None:
+            missing = nones
+        else:
+            missing |= nones
+        data = data.copy()
+        data[missing] = ''
+    if data.dtype.kind == 'S':
+        encoded = data.tolist()
+    else:
+        try:
+            encoded = list(map(str.encode, data.tolist()))
+        except TypeError:
+            msg = 'object arrays must hold only strings and None'
+            raise ValueError(msg) from None
+    lengths = numpy.fromiter(map(len, encoded), 
+                             dtype='int64', 
+                             count=len(encoded))
+    starts = numpy.cumsum(lengths) - lengths
+    return _format_strings(b''.join(encoded), starts, lengths, missing)
+
+def _format_strings(buf, starts, lengths, missing=None):
+    """Normalize strings that are already UTF-8 encoded.
+
+    The strings are the lengths bytes of buf from each of starts.  
+    They are all truncated, terminated, and copied into place at once 
+    by _gather().  Returns the normalized values and the offset of the 
+    end of each value, as _format_numpy().
+
+    missing, if given, is a boolean array marking missing values.
+    """
+    if len(lengths) == 0:
+        return (numpy.zeros(0, dtype='uint8'), numpy.zeros(0, dtype='int64'))
+    lengths = numpy.minimum(lengths, STRING_CHARACTERS)
+    if missing is not None:
+        lengths[missing] = 0
+    out_lengths = lengths + 2
+    if missing is not None:
+        out_lengths[missing] = 3
+    # the bytes past each string are gathered too, to be overwritten
+    (out, out_starts) = _gather(buf, starts, out_lengths)
+    out[out_starts+lengths] = ord('\n')
+    out[out_starts+lengths+1] = 0
+    if missing is not None:
+        out_starts = out_starts[missing]
+        out[out_starts] = 0
+        out[out_starts+1] = 0
+        out[out_starts+2] = 0
+    return (out, numpy.cumsum(out_lengths))
+
+def _gather(buf, starts, lengths):
+    """Concatenate slices of a buffer.
+
+    Returns a uint8 array of the lengths bytes of buf (bytes or a 
+    uint8 array) from each of starts, and the start of each slice in 
+    that array.  There is an index into buf for every byte of the 
+    result, so buf is indexed once.  Indexes past the end of buf are 
+    clipped to its last byte.
+    """
+    buf = numpy.frombuffer(buf, dtype='uint8')
+    if buf.shape[0] == 0:
+        buf = numpy.zeros(1, dtype='uint8')
+    out_starts = numpy.cumsum(lengths) - lengths
+    if len(lengths) == 0:
+        return (numpy.zeros(0, dtype='uint8'), out_starts)
+    total = int(out_starts[-1] + lengths[-1])
+    index = numpy.arange(total, dtype='int64')
+    index += numpy.repeat(starts - out_starts, lengths)
+    numpy.minimum(index, buf.shape[0] - 1, out=index)
+    return (buf[index], out_starts)
 
 # --- pandas functionality ----------------------------------------------
 
 def _normalize_pandas(data, digits):
-    if isinstance(data, pandas.Series):
-        # None comes out of a series as nan, so we map that back here.
-        # We would want to map pandas.NA to None as well, but pandas.NA 
-        # requires a series of data type object, so its use is unsupported 
-        # due to our data type requirements.
-        if data.dtype.kind in ['i', 'u']:
-            vals = [ None if math.isnan(v) else int(v) for v in data ]
-        elif data.dtype.kind == 'f':
-            vals = [ None if math.isnan(v) else float(v) for v in data ]
-        else:
-            raise ValueError(f'unsupported pandas data type {data.dtype}')
-        return _normalize(vals, digits)
-    elif isinstance(data, pandas.DataFrame):
-        # Special case: 
-        #     UNF of a data frame (datafile) with 1 variable:
-        #     The UNF of the data frame is the same as the UNF of the variable.
-        # https://guides.dataverse.org/en/latest/developers/unf/unf-v6.html
-        names = list(data)
-        if len(names) == 1:
-            return _normalize(data[names[0]], digits)
-        digests = [ _digest(data[name], digits) for name in data ]
-        digests.sort()
-        return _normalize(digests, digits)
-    else:
-        msg = 'pandas normalize requires a pandas Series or DataFrame'
-        raise TypeError(msg)
-    return b''
+    """Normalize a pandas series.
+
+    Data frames don't get here; _iter_normalize() splits them into 
+    vectors.  This is a generator, as _normalize_numpy().
+    """
+    if not isinstance(data, pandas.Series):
+        raise TypeError('pandas normalize requires a pandas Series')
+    array = _pandas_arrow(data)
+    if array is not None:
+        yield from _normalize_arrow(array, digits)
+        return
+    (values, missing) = _pandas_values(data)
+    yield from _normalize_numpy(values, digits, missing=missing)
+    return
+
+def _pandas_values(data):
+    """Return the values of a pandas series for _normalize_numpy().
+
+    Returns a NumPy array and a boolean array marking missing values 
+    (or None).
+    """
+    array = _pandas_arrow(data)
+    if array is not None:
+        return _arrow_values(array)
+    dtype = data.dtype
+    if isinstance(dtype, numpy.dtype):
+        # None comes out of a NumPy-backed series as nan, so we map 
+        # that back here.  Object (string) series mark missing values 
+        # with None or nan (as read_csv() does).
+        if dtype.kind in ['i', 'u', 'b']:
+            missing = None
+        elif dtype.kind == 'f':
+            missing = numpy.isnan(data.to_numpy())
+        elif dtype.kind == 'O':
+            missing = data.isna().to_numpy()
+        else:
+            raise ValueError(f'unsupported pandas data type {dtype}')
+        return (data.to_numpy(), missing)
+    # Extension data types (the nullable types and Arrow-backed types) 
+    # keep a mask of missing values (pandas.NA) apart from the values 
+    # themselves, so nan is not missing here.
+    missing = data.isna().to_numpy()
+    if _is_pandas_string(dtype):
+        values = data.to_numpy(dtype=object, na_value=None)
+    elif dtype.kind in ['i', 'u', 'f', 'b']:
+        values = data.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+    else:
+        raise ValueError(f'unsupported pandas data type {dtype}')
+    return (values, missing)
+
+def _pandas_arrow(data):
+    """Return the Arrow array of an Arrow-backed pandas series, or None.
+
+    ArrowDtype series and Arrow-backed string series (string[pyarrow], 
+    and str, the default string type of pandas 3) are normalized from 
+    their Arrow buffers, as Arrow arrays are, rather than converted to 
+    Python objects.
+    """
+    dtype = data.dtype
+    if isinstance(dtype, pandas.StringDtype):
+        if not dtype.storage.startswith('pyarrow'):
+            return None
+    elif not isinstance(dtype, pandas.ArrowDtype):
+        return None
+    _import('pyarrow')
+    return pyarrow.array(data.array)
+
+def _is_pandas_string(dtype):
+    """Return whether a pandas data type is a string type."""
+    if isinstance(dtype, pandas.StringDtype):
+        return True
+    # string[pyarrow] is a StringDtype, but pandas.ArrowDtype(pa.string()) 
+    # is not
+    if isinstance(dtype, pandas.ArrowDtype):
+        return dtype.kind == 'U'
+    return False
+
+# --- Arrow functionality -----------------------------------------------
+
+def _normalize_arrow(data, digits):
+    """Normalize an Arrow array or chunked array.
+
+    Tables and record batches don't get here; _iter_normalize() splits 
+    them into vectors.  This is a generator, as _normalize_numpy(), 
+    generating the pieces chunk by chunk.  Numeric values are read 
+    directly from the array buffers and nulls are missing values.
+    """
+    if isinstance(data, pyarrow.ChunkedArray):
+        for chunk in data.chunks:
+            yield from _normalize_arrow(chunk, digits)
+        return
+    if len(data) == 0:
+        return
+    if pyarrow.types.is_dictionary(data.type):
+        yield from _normalize_arrow(data.dictionary_decode(), digits)
+        return
+    if pyarrow.types.is_null(data.type):
+        yield b'\0\0\0' * len(data)
+        return
+    if pyarrow.types.is_string(data.type) \
+            or pyarrow.types.is_large_string(data.type):
+        # the values are already UTF-8, so we need only find them
+        buffers = data.buffers()
+        missing = _arrow_missing(data)
+        if pyarrow.types.is_string(data.type):
+            dtype = numpy.dtype('int32')
+        else:
+            dtype = numpy.dtype('int64')
+        offsets = numpy.frombuffer(buffers[1], 
+                                   dtype=dtype, 
+                                   count=len(data)+1, 
+                                   offset=data.offset*dtype.itemsize)
+        yield _format_strings(buffers[2] or b'', 
+                              offsets[:-1], 
+                              numpy.diff(offsets), 
+                              missing)[0]
+        return
+    (values, missing) = _arrow_values(data)
+    yield from _normalize_numpy(values, digits, missing=missing)
+    return
+
+def _arrow_values(data):
+    """Return the values of an Arrow array for _normalize_numpy().
+
+    Returns a NumPy array and a boolean array marking missing values 
+    (or None).  Numeric values are read directly from the array 
+    buffers.
+    """
+    if isinstance(data, pyarrow.ChunkedArray):
+        data = data.combine_chunks()
+    if pyarrow.types.is_dictionary(data.type):
+        return _arrow_values(data.dictionary_decode())
+    if pyarrow.types.is_null(data.type):
+        return (numpy.zeros(len(data), dtype=bool), 
+                numpy.ones(len(data), dtype=bool))
+    buffers = data.buffers()
+    missing = _arrow_missing(data)
+    if pyarrow.types.is_boolean(data.type):
+        values = _arrow_bits(buffers[1], data.offset, len(data))
+    elif pyarrow.types.is_integer(data.type) \
+            or pyarrow.types.is_floating(data.type):
+        dtype = numpy.dtype(data.type.to_pandas_dtype())
+        values = numpy.frombuffer(buffers[1], 
+                                  dtype=dtype, 
+                                  count=len(data), 
+                                  offset=data.offset*dtype.itemsize)
+    elif pyarrow.types.is_string(data.type) \
+            or pyarrow.types.is_large_string(data.type):
+        values = data.to_numpy(zero_copy_only=False)
+    else:
+        raise ValueError(f'unsupported Arrow data type {data.type}')
+    return (values, missing)
+
+def _arrow_missing(data):
+    """Return a boolean array marking the nulls of an Arrow array."""
+    bitmap = data.buffers()[0]
+    if bitmap is None:
+        return None
+    return ~_arrow_bits(bitmap, data.offset, len(data))
+
+def _arrow_bits(buffer, offset, length):
+    """Unpack length bits from an Arrow bitmap, starting at bit offset."""
+    start = offset // 8
+    stop = (offset + length + 7) // 8
+    bits = numpy.frombuffer(buffer, dtype='uint8')[start:stop]
+    bits = numpy.unpackbits(bits, bitorder='little').view(bool)
+    return bits[offset%8:offset%8+length]
+
+# --- file functionality ------------------------------------------------
+
+def _mmap_digests(path, digits=DEFAULT_DIGITS, dtype=None, shape=None, 
+                  order='C', offset=0):
+    """Return the digests of the vectors of an array (see unf_mmap())."""
+    if not _import('numpy'):
+        raise ImportError('numpy is required to map arrays')
+    _check_digits(digits)
+    if dtype is None:
+        data = numpy.load(path, mmap_mode='r')
+    else:
+        data = numpy.memmap(path, 
+                            dtype=dtype, 
+                            mode='r', 
+                            offset=offset, 
+                            shape=shape, 
+                            order=order)
+    if data.ndim not in (1, 2):
+        raise ValueError('numpy arrays must be 1- or 2-D')
+    window = max(1, MMAP_WINDOW_BYTES // data.dtype.itemsize)
+    if data.ndim == 1:
+        hashers = [UNFHasher(digits)]
+        for start in range(0, data.shape[0], window):
+            hashers[0].update(data[start:start+window])
+    elif data.shape[1] <= NUMPY_BLOCK_SIZE:
+        # Short rows are digested together (see _short_digests()), a 
+        # window of rows at a time.
+        height = max(1, window // max(data.shape[1], 1))
+        digests = []
+        for start in range(0, data.shape[0], height):
+            block = numpy.ascontiguousarray(data[start:start+height])
+            digests += _digest_vectors(list(enumerate(block)), digits)
+        return digests
+    elif data.flags.f_contiguous and not data.flags.c_contiguous:
+        # Each row is spread across the file, so we read windows of 
+        # columns (which are contiguous) and pass the pieces of every 
+        # row to that row's hasher.
+        hashers = [ UNFHasher(digits) for i in range(data.shape[0]) ]
+        width = max(window // max(data.shape[0], 1), MMAP_MIN_COLUMNS)
+        for start in range(0, data.shape[1], width):
+            block = data[:, start:start+width]
+            for (hasher, row) in zip(hashers, block):
+                hasher.update(row)
+    else:
+        hashers = []
+        for row in data:
+            hasher = UNFHasher(digits)
+            for start in range(0, row.shape[0], window):
+                hasher.update(row[start:start+window])
+            hashers.append(hasher)
+    return [ hasher._encoded_digest() for hasher in hashers ]
+
+_FILE_FORMATS = {
+    '.parquet': 'parquet', 
+    '.pq': 'parquet', 
+    '.csv': 'csv', 
+    '.tsv': 'tsv', 
+    '.tab': 'tsv', 
+}
+
+_COMPRESSION_EXTENSIONS = ('.gz', '.bz2', '.lz4', '.zst')
+
+def _file_format(path):
+    """Return the format of a data file (by its extension)."""
+    name = os.path.basename(path).lower()
+    for ext in _COMPRESSION_EXTENSIONS:
+        if name.endswith(ext):
+            name = name[:-len(ext)]
+    ext = os.path.splitext(name)[1]
+    if ext not in _FILE_FORMATS:
+        raise ValueError(f'unknown file format for {path}')
+    return _FILE_FORMATS[ext]
+
+def _file_digests(path, columns=None, digits=DEFAULT_DIGITS, cache=None, 
+                  column_types=None):
+    """Return the digests of the columns of a data file (see unf_file()).
+
+    Returns a dictionary mapping column names to digests.
+    """
+    if not _import('pyarrow'):
+        raise ImportError('pyarrow is required to read files')
+    _check_digits(digits)
+    names = _file_columns(path)
+    if columns is None:
+        columns = names
+    for name in columns:
+        if name not in names:
+            raise ValueError(f'no column {name!r} in {path}')
+    column_types = column_types or {}
+    digests = {}
+    if cache is not None:
+        identity = _file_identity(path)
+        keys = {}
+        for name in columns:
+            keys[name] = f'{identity}:{name}'
+            if name in column_types:
+                keys[name] += f':{column_types[name]}'
+        found = cache.lookup(keys.values(), digits)
+        digests = { name: found[key] 
+                    for (name, key) in keys.items() if key in found }
+        columns = [ name for name in columns if name not in digests ]
+    # Every column has a hasher before the file is read, so the columns 
+    # of a file with no rows are empty vectors.
+    hashers = { name: UNFHasher(digits) for name in columns }
+    if hashers:
+        for batch in _read_file(path, list(hashers), column_types):
+            for (name, column) in zip(batch.column_names, batch.columns):
+                hashers[name].update(column)
+    for (name, hasher) in hashers.items():
+        digests[name] = hasher._encoded_digest()
+    if cache is not None:
+        entries = { keys[name]: digests[name] for name in hashers }
+        cache.store(entries, digits)
+    return digests
+
+def _file_identity(path):
+    """Return a string identifying a file by path, size, and mtime."""
+    stat = os.stat(path)
+    return f'file:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'
+
+def _file_columns(path):
+    """Return the column names of a data file."""
+    if _file_format(path) == 'parquet':
+        import pyarrow.parquet
+        return pyarrow.parquet.read_schema(path).names
+    with _csv_reader(path) as reader:
+        return reader.schema.names
+
+def _read_file(path, columns=None, column_types=None):
+    """Read a data file, generating Arrow record batches.
+
+    column_types applies to CSV and TSV files (see _open_csv()).
+    """
+    if _file_format(path) == 'parquet':
+        import pyarrow.parquet
+        with pyarrow.parquet.ParquetFile(path) as f:
+            yield from f.iter_batches(batch_size=PARQUET_BATCH_SIZE, 
+                                      columns=columns)
+        return
+    with _open_csv(path, columns, column_types) as reader:
+        yield from reader
+    return
+
+def _open_csv(path, columns=None, column_types=None):
+    """Open a CSV or TSV file as a stream of Arrow record batches.
+
+    Column types are inferred from the first block, but integer columns 
+    are read as floats, which normalize the same, so that a fraction in 
+    a later block doesn't fail the read.  Columns of only missing 
+    values (inferred as null, which fails on any later value) and 
+    date and time columns (which read_csv() leaves as strings) are 
+    read as strings.  column_types (a dictionary mapping column names 
+    to Arrow data types) overrides these.
+    """
+    types = {}
+    with _csv_reader(path) as reader:
+        for field in reader.schema:
+            if pyarrow.types.is_integer(field.type):
+                types[field.name] = pyarrow.float64()
+            elif pyarrow.types.is_null(field.type) \
+                    or pyarrow.types.is_temporal(field.type):
+                types[field.name] = pyarrow.string()
+    types.update(column_types or {})
+    return _csv_reader(path, columns, types)
+
+def _csv_reader(path, columns=None, column_types=None):
+    """Open a CSV or TSV file with the given columns and types."""
+    import pyarrow.csv
+    read_options = pyarrow.csv.ReadOptions(block_size=CSV_BLOCK_SIZE)
+    delimiter = '\t' if _file_format(path) == 'tsv' else ','
+    parse_options = pyarrow.csv.ParseOptions(delimiter=delimiter)
+    convert_options = pyarrow.csv.ConvertOptions(
+        include_columns=columns, 
+        column_types=column_types, 
+        null_values=CSV_NULL_VALUES, 
+        strings_can_be_null=True, 
+    )
+    return pyarrow.csv.open_csv(path, 
+                                read_options=read_options, 
+                                parse_options=parse_options, 
+                                convert_options=convert_options)
+
+# --- command line ------------------------------------------------------
+
+def main(args=None):
+    """Print the UNFs of data files (the unf command or python -m unf)."""
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(
+        prog='unf', 
+        description='Calculate the UNFs of data files (Parquet, CSV, TSV, '
+                    'or NumPy .npy files).'
+    )
+    parser.add_argument('--digits', '-d', 
+                        type=int, 
+                        default=DEFAULT_DIGITS, 
+                        help='significant digits (default %(default)s)')
+    parser.add_argument('--columns', '-c', 
+                        help='comma-separated list of columns to include')
+    parser.add_argument('--per-column', 
+                        action='store_true', 
+                        help='also print the UNF of each column (or of '
+                             'each row of a .npy array)')
+    parser.add_argument('--jobs', '-j', 
+                        type=int, 
+                        default=1, 
+                        help='number of worker processes, each '
+                             'fingerprinting a file at a time (default '
+                             '%(default)s)')
+    parser.add_argument('--text', 
+                        action='store_true', 
+                        help='print a line per UNF, as UNF and path, '
+                             'instead of a JSON object per file')
+    parser.add_argument('paths', 
+                        nargs='+', 
+                        metavar='PATH', 
+                        help='a data file, or a directory to search for '
+                             'data files')
+    args = parser.parse_args(args)
+    if args.digits < 1:
+        parser.error('digits must be positive')
+    if args.jobs < 1:
+        parser.error('jobs must be positive')
+    columns = args.columns.split(',') if args.columns else None
+    fingerprint = functools.partial(_fingerprint_file, 
+                                    columns=columns, 
+                                    digits=args.digits, 
+                                    per_column=args.per_column)
+    rv = 0
+    for result in _map_files(fingerprint, _data_files(args.paths), args.jobs):
+        if not args.text:
+            print(json.dumps(result), flush=True)
+        elif 'error' in result:
+            print(f'unf: {result["path"]}: {result["error"]}', 
+                  file=sys.stderr)
+        else:
+            print(f'{result["unf"]}  {result["path"]}')
+            for (name, u) in result.get('columns', {}).items():
+                print(f'{u}  {result["path"]}:{name}')
+            sys.stdout.flush()
+        if 'error' in result:
+            rv = 1
+    return rv
+
+# With --jobs, each worker has at most this many files queued, so that 
+# directories are searched as files are fingerprinted.
+_JOB_QUEUE_SIZE = 4
+
+def _data_files(paths):
+    """Generate the data files at paths, searching directories.
+
+    Files in directories are found (in sorted order) by their 
+    extensions; files named in paths are included whatever their names.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for (dirpath, dirnames, filenames) in os.walk(path):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if _is_data_file(name):
+                    yield os.path.join(dirpath, name)
+    return
+
+def _is_data_file(path):
+    """Return whether a path has the extension of a data file."""
+    if path.lower().endswith('.npy'):
+        return True
+    try:
+        _file_format(path)
+    except ValueError:
+        return False
+    return True
+
+def _fingerprint_file(path, columns, digits, per_column):
+    """Fingerprint a data file for main().
+
+    Returns a dictionary of the path and its UNF (and the UNFs of its 
+    columns if per_column is true), or of the path and an error 
+    message.
+    """
+    try:
+        if path.lower().endswith('.npy'):
+            if columns is not None:
+                raise ValueError('columns cannot be selected in .npy files')
+            digests = { str(i): digest for (i, digest) 
+                        in enumerate(_mmap_digests(path, digits)) }
+        else:
+            digests = _file_digests(path, columns, digits)
+    except Exception as exc:
+        return {'path': path, 'error': str(exc) or type(exc).__name__}
+    result = {
+        'path': path, 
+        'unf': _digests_unf(list(digests.values()), digits), 
+    }
+    if per_column:
+        result['columns'] = { name: _unf_string(digest, digits) 
+                              for (name, digest) in digests.items() }
+    return result
+
+def _map_files(function, paths, jobs):
+    """Generate function(path) for each of paths, in order.
+
+    With more than one job, the calls are made in a pool of that many 
+    processes.
+    """
+    if jobs == 1:
+        yield from map(function, paths)
+        return
+    import concurrent.futures
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        futures = collections.deque()
+        for path in paths:
+            futures.append(executor.submit(function, path))
+            if len(futures) >= jobs * _JOB_QUEUE_SIZE:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+    return
+
+if __name__ == '__main__':
+    sys.exit(main())
 
 # eof